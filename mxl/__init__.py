@@ -1,5 +1,6 @@
-from .mxl import MXL
-
-
 def setup(bot):
+    # Imported here so the scraping helpers and constants can be loaded (and
+    # tested) without Red installed.
+    from .mxl import MXL
+
     bot.add_cog(MXL())
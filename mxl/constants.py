@@ -1491,3 +1491,27 @@ DEFAULT_TRADE_POST_TEMPLATE = """[color=#FFFF00][size=26]Selling[/size][/color]
 
 {misc}
 """
+
+
+def _item_categories():
+    # Items classified by name alone, in the order _scrape_items used to check
+    # the lists - a name that's in several of them keeps its first category.
+    categories = {}
+    for category, names in (
+        ("su", SU_ITEMS),
+        ("other", ["Jewel"]),
+        ("ssu", SSU_ITEMS),
+        ("sssu", SSSU_ITEMS),
+        ("runewords", RUNEWORDS),
+        ("amulets", AMULETS),
+        ("rings", RINGS),
+        ("jewels", JEWELS),
+        ("quivers", QUIVERS),
+        ("mos", MOS),
+    ):
+        for name in names:
+            categories.setdefault(name, category)
+    return categories
+
+
+ITEM_CATEGORIES = _item_categories()
@@ -11,6 +11,8 @@ from typing import Dict, List, Set
 import flickrapi
 import imgkit
 
+from .parsing import parse_fragment
+
 
 class PostGenerationErrors(enum.Enum):
     IMAGE_UPLOAD_FAILED = (1,)
@@ -49,6 +51,25 @@ class Set:
     items: Dict[str, Item] = dataclasses.field(default_factory=dict)
 
 
+@dataclasses.dataclass
+class Auction:
+    title: str
+    description: str
+    image: str = None
+
+
+@dataclasses.dataclass
+class ScrapedItem:
+    """One armory item, classified. `category` names the ItemDump field it belongs to."""
+
+    category: str
+    name: str
+    character: str
+    quantity: float
+    html: str
+    set_name: str = None
+
+
 @dataclasses.dataclass
 class ItemDump:
     sets: Dict[str, Set] = dataclasses.field(default_factory=dict)
@@ -89,83 +110,22 @@ class ItemDump:
             or self.other
         )
 
+    def add(self, scraped):
+        if scraped.category == "sets":
+            self.increment_set_item(
+                scraped.set_name, scraped.name, scraped.character, scraped.html
+            )
+            return
+
+        getattr(self, scraped.category).setdefault(
+            scraped.name, Item(name=scraped.name)
+        ).increment(scraped.character, scraped.html, scraped.quantity)
+
     def increment_set_item(self, set_name, item_name, character, html):
         self.sets.setdefault(set_name, Set(name=set_name)).items.setdefault(
             item_name, Item(name=item_name)
         ).increment(character, html)
 
-    def increment_su(self, item_name, character, html):
-        self.su.setdefault(item_name, Item(name=item_name)).increment(character, html)
-
-    def increment_ssu(self, item_name, character, html):
-        self.ssu.setdefault(item_name, Item(name=item_name)).increment(character, html)
-
-    def increment_sssu(self, item_name, character, html):
-        self.sssu.setdefault(item_name, Item(name=item_name)).increment(character, html)
-
-    def increment_amulet(self, item_name, character, html):
-        self.amulets.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_ring(self, item_name, character, html):
-        self.rings.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_jewel(self, item_name, character, html):
-        self.jewels.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_mo(self, item_name, character, html):
-        self.mos.setdefault(item_name, Item(name=item_name)).increment(character, html)
-
-    def increment_quiver(self, item_name, character, html):
-        self.quivers.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_rw(self, item_name, character, html):
-        self.runewords.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_rw_base(self, item_name, character, html):
-        self.rw_bases.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_shrine_base(self, item_name, character, html):
-        self.shrine_bases.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_charm(self, item_name, character, html):
-        self.charms.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_trophy(self, item_name, character, html, amount=1):
-        self.trophies.setdefault(item_name, Item(name=item_name)).increment(
-            character, html, amount
-        )
-
-    def increment_shrine(self, item_name, character, html, amount=1):
-        self.shrines.setdefault(item_name, Item(name=item_name)).increment(
-            character, html, amount
-        )
-
-    def increment_crafted(self, item_name, character, html):
-        self.crafted.setdefault(item_name, Item(name=item_name)).increment(
-            character, html
-        )
-
-    def increment_other(self, item_name, character, html, amount=1):
-        self.other.setdefault(item_name, Item(name=item_name)).increment(
-            character, html, amount
-        )
-
     async def to_trade_post(
         self,
         post_template,
@@ -232,7 +192,8 @@ class ItemDump:
             if user_config["generate_crafted_images"]:
                 crafted_str += "[spoil]\n"
 
-                for tag in item.html:
+                for html in item.html:
+                    tag = parse_fragment(html)
                     if tag.find(class_="gear_img"):
                         tag.img.extract()
                     else:
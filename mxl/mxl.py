@@ -1,38 +1,49 @@
+import asyncio
 import concurrent.futures
 import enum
+import functools
 import random
 import re
+import time
 import urllib
 
 import aiohttp
 import discord
 import flickrapi
-from bs4 import BeautifulSoup
 from redbot.core import Config, checks, commands, data_manager
 from redbot.core.utils.chat_formatting import pagify
 
 from .constants import (
-    AMULETS,
     CHARMS,
     DEFAULT_TRADE_POST_TEMPLATE,
     IGNORED_ITEMS,
-    JEWELS,
+    ITEM_CATEGORIES,
     MISC_ITEMS,
-    MOS,
-    QUIVERS,
-    RINGS,
-    RUNEWORDS,
     SETS,
     SHRINE_VESSELS,
-    SSSU_ITEMS,
-    SSU_ITEMS,
-    SU_ITEMS,
     TROPHIES,
     VESSEL_TO_SHRINE,
 )
-from .dclasses import ItemDump, PostGenerationErrors
+from .dclasses import Auction, ItemDump, PostGenerationErrors, ScrapedItem
+from .parsing import ArmoryPage, parse_armory_page, parse_html
 from .pastebin import PasteBin
 
+SET_NAME_PATTERN = re.compile(r"\[([^\]]+)")
+QUANTITY_PATTERN = re.compile(r"\[(\d+)x\]")
+CLASS_PATTERN = re.compile(
+    r"(Amazon|Assassin|Barbarian|Druid|Necromancer|Paladin|Sorceress)"
+)
+SHRINE_PATTERN = re.compile(r"Shrine \(([^\)]+)")
+STACK_QUANTITY_PATTERN = re.compile(r"Quantity: ([0-9]+)")
+AC_SHARDS_PATTERN = re.compile(r"Shards \(([^\)]+)")
+
+
+IGNORED_NAMES = frozenset(IGNORED_ITEMS)
+MISC_NAMES = frozenset(MISC_ITEMS)
+CHARM_NAMES = frozenset(CHARMS)
+TROPHY_NAMES = frozenset(TROPHIES)
+SHRINE_VESSEL_NAMES = frozenset(SHRINE_VESSELS)
+
 
 class LoginError(enum.Enum):
     NONE = 0
@@ -64,6 +75,10 @@ class MXL(commands.Cog):
         self.thread_pool = concurrent.futures.ThreadPoolExecutor(
             max_workers=3, thread_name_prefix="mxl_"
         )
+        self.auctions_ttl = 60
+        self._auctions = None
+        self._auctions_fetched = 0
+        self._auctions_refresh = None
 
         default_config = {
             "forum_username": "",
@@ -110,13 +125,12 @@ class MXL(commands.Cog):
         If there are more than 5 active auctions, prints them in a DM instead.
         """
 
-        async with aiohttp.request("GET", self.auctions_endpoint) as api_response:
-            if api_response.status != 200:
-                await ctx.send("Couldn't contact the MXL API. Try again later.")
-                return
-
-            embeds = self._get_auction_embeds((await api_response.json())["auctions"])
+        auctions = await self._get_auctions()
+        if auctions is None:
+            await ctx.send("Couldn't contact the MXL API. Try again later.")
+            return
 
+        embeds = [self._auction_embed(auction) for auction in auctions]
         if not embeds:
             await ctx.send("There are no active auctions at the moment.")
             return
@@ -135,15 +149,15 @@ class MXL(commands.Cog):
 
         If there are more than 5 results, prints them in a DM instead.
         """
-        async with aiohttp.request("GET", self.auctions_endpoint) as api_response:
-            if api_response.status != 200:
-                await ctx.send("Couldn't contact the MXL API. Try again later.")
-                return
-
-            embeds = self._get_auction_embeds((await api_response.json())["auctions"])
+        auctions = await self._get_auctions()
+        if auctions is None:
+            await ctx.send("Couldn't contact the MXL API. Try again later.")
+            return
 
         matching_auctions = [
-            embed for embed in embeds if re.search(title, embed.title, re.IGNORECASE)
+            self._auction_embed(auction)
+            for auction in auctions
+            if re.search(title, auction.title, re.IGNORECASE)
         ]
         if not matching_auctions:
             await ctx.send(
@@ -386,7 +400,7 @@ class MXL(commands.Cog):
             data={"search": item, "submit": ""},
             cookies=config["forum_cookies"],
         ) as pricecheck_response:
-            dom = BeautifulSoup(await pricecheck_response.text(), "html.parser")
+            dom = parse_html(await pricecheck_response.text())
 
         if dom.find(not_logged_in_function):
             error, config = await self._forum_login()
@@ -415,7 +429,7 @@ class MXL(commands.Cog):
                 data={"search": item, "submit": ""},
                 cookies=config["forum_cookies"],
             ) as pricecheck_response:
-                dom = BeautifulSoup(await pricecheck_response.text(), "html.parser")
+                dom = parse_html(await pricecheck_response.text())
 
             if dom.find(not_logged_in_function):
                 await ctx.send(
@@ -469,7 +483,7 @@ class MXL(commands.Cog):
             self.forum_logout_endpoint.format(config["forum_cookies"]["MedianXL_sid"]),
             cookies=config["forum_cookies"],
         ) as logout_response:
-            dom = BeautifulSoup(await logout_response.text(), "html.parser")
+            dom = parse_html(await logout_response.text())
         if dom.find(title="Login"):
             config["forum_cookies"] = {
                 "MedianXL_u": "",
@@ -502,7 +516,7 @@ class MXL(commands.Cog):
         async with aiohttp.request(
             "GET", self.armory_logout_endpoint, cookies=config["armory_cookies"]
         ) as logout_response:
-            dom = BeautifulSoup(await logout_response.text(), "html.parser")
+            dom = parse_html(await logout_response.text())
 
         if not dom.find(action="login.php"):
             await ctx.send("Unknown error during armory logout.")
@@ -562,41 +576,57 @@ class MXL(commands.Cog):
             )
             return
 
-        items = ItemDump()
-        for character in characters:
-            async with aiohttp.request(
-                "GET",
-                self.armory_character_endpoint.format(character),
-                cookies=config["armory_cookies"],
-            ) as character_response:
-                dom = BeautifulSoup(await character_response.text(), "html.parser")
-
-            if dom.find(action="login.php"):
+        async with aiohttp.ClientSession(
+            cookie_jar=aiohttp.DummyCookieJar()
+        ) as session:
+            pages = await self._fetch_armory_pages(
+                session, characters, config["armory_cookies"]
+            )
+            results = await self._parse_armory_pages(pages, characters, user_config)
+
+            # The session expired for some characters - log in once and refetch only those.
+            logged_out = [
+                index
+                for index, (status, _) in enumerate(results)
+                if status == ArmoryPage.LOGGED_OUT
+            ]
+            if logged_out:
                 error, config = await self._armory_login()
                 if error:
                     await ctx.send(
                         "Incorrect armory username/password or armory is not reachable."
                     )
                     return
-                async with aiohttp.request(
-                    "GET",
-                    self.armory_character_endpoint.format(character),
-                    cookies=config["armory_cookies"],
-                ) as character_response:
-                    dom = BeautifulSoup(await character_response.text(), "html.parser")
+                retried = [characters[index] for index in logged_out]
+                pages = await self._fetch_armory_pages(
+                    session, retried, config["armory_cookies"]
+                )
+                retried_results = await self._parse_armory_pages(
+                    pages, retried, user_config
+                )
+                for index, result in zip(logged_out, retried_results):
+                    results[index] = result
 
-            if dom.div.div and "not found" in dom.div.div.text:
+        items = ItemDump()
+        for character, (status, scraped_items) in zip(characters, results):
+            if status == ArmoryPage.LOGGED_OUT:
+                await ctx.send(
+                    f"Couldn't log into the armory to view character {character}. Skipping."
+                )
+                continue
+
+            if status == ArmoryPage.NOT_FOUND:
                 await ctx.send(f"Character {character} does not exist! Skipping.")
                 continue
 
-            if dom.h1 and "not allowed" in dom.h1.text:
+            if status == ArmoryPage.PRIVATE:
                 await ctx.send(
                     f"Character {character}'s armory is private! Please log into the armory and make it publicly viewable to dump its items. Skipping."
                 )
                 continue
 
-            item_dump = dom.find_all(class_="item-wrapper")
-            self._scrape_items(item_dump, items, character, user_config)
+            for scraped in scraped_items:
+                items.add(scraped)
 
         if not items:
             await ctx.send("No items found.")
@@ -724,6 +754,19 @@ class MXL(commands.Cog):
         for page in pagify(flickr_cache_msg, page_length=1992):
             await channel.send(f"```py\n{page}```")
 
+    async def _fetch_armory_pages(self, session, characters, cookies, limit=4):
+        """Fetches the characters' armory pages concurrently, returned in order."""
+        semaphore = asyncio.Semaphore(limit)
+
+        async def fetch(character):
+            async with semaphore:
+                async with session.get(
+                    self.armory_character_endpoint.format(character), cookies=cookies
+                ) as character_response:
+                    return await character_response.text()
+
+        return await asyncio.gather(*(fetch(character) for character in characters))
+
     async def _forum_login(self):
         config = await self._config.all()
         async with aiohttp.request("GET", self.tradecenter_enpoint) as response:
@@ -740,7 +783,7 @@ class MXL(commands.Cog):
                 "sid": session_id,
             },
         ) as login_response:
-            dom = BeautifulSoup(await login_response.text(), "html.parser")
+            dom = parse_html(await login_response.text())
 
         error = dom.find(class_="error")
         if error is None:
@@ -774,16 +817,50 @@ class MXL(commands.Cog):
             data={"user": config["armory_username"], "pass": config["armory_password"]},
             cookies={"PHPSESSID": session_id},
         ) as login_response:
-            dom = BeautifulSoup(await login_response.text(), "html.parser")
+            login_page = await login_response.text()
 
-        if not dom.contents:
+        # A successful login answers with an empty page; anything else, even
+        # whitespace, is the login form again.
+        if not login_page:
             config["armory_cookies"] = {"PHPSESSID": session_id}
             await self._config.set(config)
             return False, config
 
         return True, None
 
-    def _scrape_items(self, item_dump, items, character, user_config):
+    def _parse_armory_page(self, page, character, user_config):
+        """
+        Parses a character's armory page and classifies its items.
+        Blocking; run it in the thread pool.
+        """
+        status, item_dump = parse_armory_page(page)
+        if status != ArmoryPage.OK:
+            return status, []
+
+        return status, self._scrape_items(item_dump, character, user_config)
+
+    async def _parse_armory_pages(self, pages, characters, user_config):
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(
+            *(
+                loop.run_in_executor(
+                    self.thread_pool,
+                    functools.partial(
+                        self._parse_armory_page, page, character, user_config
+                    ),
+                )
+                for page, character in zip(pages, characters)
+            )
+        )
+
+    def _scrape_items(self, item_dump, character, user_config):
+        items = []
+
+        def add(html, category, name, quantity=1, set_name=None):
+            items.append(
+                ScrapedItem(category, name, character, quantity, html, set_name)
+            )
+
         for item in item_dump:
             item_name = ""
             set_match = None
@@ -792,180 +869,123 @@ class MXL(commands.Cog):
                     item.font.br.extract()
 
                 item_name = item.font.text
-                set_match = re.search(r"\[([^\]]+)", item.font.text)
+                set_match = SET_NAME_PATTERN.search(item.font.text)
             else:
                 if item.span.br:
                     item.span.br.extract()
 
                 item_name = item.span.text
-                set_match = re.search(r"\[([^\]]+)", item.span.text)
+                set_match = SET_NAME_PATTERN.search(item.span.text)
 
-            quantity_match = re.search(r"\[(\d+)x\]", item.parent.parent.span.text)
+            quantity_match = QUANTITY_PATTERN.search(item.parent.parent.span.text)
             item_quantity = int(quantity_match.group(1)) if quantity_match else 1
 
-            if item_name in IGNORED_ITEMS:
+            if item_name in IGNORED_NAMES:
                 continue
 
+            html = str(item.parent.parent)
+
             if item_name == "Eye of Wisdom":
-                class_match = re.search(
-                    r"(Amazon|Assassin|Barbarian|Druid|Necromancer|Paladin|Sorceress)",
-                    item.text,
-                )
+                class_match = CLASS_PATTERN.search(item.text)
                 if not class_match:
-                    items.increment_set_item(
-                        "Unknown", item_name, character, item.parent.parent
-                    )
+                    add(html, "sets", item_name, set_name="Unknown")
                     continue
 
                 class_name = class_match.group(1)
                 item_name = f"Eye of Wisdom ({class_name})"
-                items.increment_set_item(
-                    SETS[item_name], item_name, character, item.parent.parent
-                )
+                add(html, "sets", item_name, set_name=SETS[item_name])
                 continue
 
             if set_match:
                 set_name = set_match.group(1)
                 item_name = item_name.split("[")[0].strip()
-                items.increment_set_item(
-                    set_name, item_name, character, item.parent.parent
-                )
+                add(html, "sets", item_name, set_name=set_name)
                 continue
 
             if item.span["class"][0] == "color-green" and item_name in SETS.keys():
-                set_name = SETS[item_name]
-                items.increment_set_item(
-                    set_name, item_name, character, item.parent.parent
-                )
+                add(html, "sets", item_name, set_name=SETS[item_name])
                 continue
 
-            if item_name in SU_ITEMS:
-                items.increment_su(item_name, character, item.parent.parent)
-                continue
-
-            if item_name == "Jewel":
-                items.increment_other("Jewel", character, item.parent.parent)
-                continue
-
-            if item_name in SSU_ITEMS:
-                items.increment_ssu(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in SSSU_ITEMS:
-                items.increment_sssu(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in RUNEWORDS:
-                items.increment_rw(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in AMULETS:
-                items.increment_amulet(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in RINGS:
-                items.increment_ring(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in JEWELS:
-                items.increment_jewel(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in QUIVERS:
-                items.increment_quiver(item_name, character, item.parent.parent)
-                continue
-
-            if item_name in MOS:
-                items.increment_mo(item_name, character, item.parent.parent)
+            category = ITEM_CATEGORIES.get(item_name)
+            if category is not None:
+                add(html, category, item_name)
                 continue
 
             if (
                 item.span["class"][0] == "color-white"
                 or item.span["class"][0] == "color-blue"
-            ) and item_name not in MISC_ITEMS:
+            ) and item_name not in MISC_NAMES:
                 base_name = (
                     item_name + " [eth]"
                     if "Ethereal" in item.text
                     else "".join(item_name.split("Superior "))
                 )
-                items.increment_rw_base(base_name, character, item.parent.parent)
+                add(html, "rw_bases", base_name)
                 continue
 
             if item.span["class"][0] == "color-yellow":
-                items.increment_shrine_base(item_name, character, item.parent.parent)
+                add(html, "shrine_bases", item_name)
                 continue
 
-            if item_name in CHARMS:
-                items.increment_charm(item_name, character, item.parent.parent)
+            if item_name in CHARM_NAMES:
+                add(html, "charms", item_name)
                 continue
 
-            shrine_match = re.search(r"Shrine \(([^\)]+)", item_name)
+            shrine_match = SHRINE_PATTERN.search(item_name)
             if shrine_match:
                 shrine_name = item_name.split("(")[0].strip()
                 amount = int(shrine_match.group(1)) / 10
-                items.increment_shrine(
-                    shrine_name, character, item.parent.parent, amount
-                )
+                add(html, "shrines", shrine_name, amount)
                 continue
 
-            if item_name in SHRINE_VESSELS:
+            if item_name in SHRINE_VESSEL_NAMES:
                 vessel_amount = int(
                     (
-                        re.search(
-                            r"Quantity: ([0-9]+)", item.find(class_="color-grey").text
+                        STACK_QUANTITY_PATTERN.search(
+                            item.find(class_="color-grey").text
                         )
                     ).group(1)
                 )
                 shrine_name = VESSEL_TO_SHRINE[item_name]
-                items.increment_shrine(
-                    shrine_name, character, item.parent.parent, vessel_amount
-                )
+                add(html, "shrines", shrine_name, vessel_amount)
                 continue
 
             if item_name == "Arcane Cluster":
                 crystals_amount = int(
                     (
-                        re.search(
-                            r"Quantity: ([0-9]+)", item.find(class_="color-grey").text
+                        STACK_QUANTITY_PATTERN.search(
+                            item.find(class_="color-grey").text
                         )
                     ).group(1)
                 )
-                items.increment_other(
-                    "Arcane Crystal", character, item.parent.parent, crystals_amount
-                )
+                add(html, "other", "Arcane Crystal", crystals_amount)
                 continue
 
-            AC_shards_match = re.search(r"Shards \(([^\)]+)", item_name)
+            AC_shards_match = AC_SHARDS_PATTERN.search(item_name)
             if AC_shards_match:
                 amount = int(AC_shards_match.group(1)) / 5
-                items.increment_other(
-                    "Arcane Crystal", character, item.parent.parent, amount
-                )
+                add(html, "other", "Arcane Crystal", amount)
                 continue
 
             if (
                 item.span["class"][0] == "color-orange"
-                and item_name not in MISC_ITEMS
-                and item_name not in TROPHIES
+                and item_name not in MISC_NAMES
+                and item_name not in TROPHY_NAMES
             ):
                 if user_config["crafted_as_base"]:
-                    items.increment_shrine_base(
-                        item_name, character, item.parent.parent
-                    )
+                    add(html, "shrine_bases", item_name)
                     continue
 
-                items.increment_crafted(item_name, character, item.parent.parent)
+                add(html, "crafted", item_name)
                 continue
 
-            if item_name in TROPHIES:
-                items.increment_trophy(
-                    item_name, character, item.parent.parent, item_quantity
-                )
+            if item_name in TROPHY_NAMES:
+                add(html, "trophies", item_name, item_quantity)
                 continue
 
-            items.increment_other(
-                item_name, character, item.parent.parent, item_quantity
-            )
+            add(html, "other", item_name, item_quantity)
+
+        return items
 
     async def _create_pastebin(self, text, title=None):
         api_key = await self._config.pastebin_api_key()
@@ -981,10 +1001,44 @@ class MXL(commands.Cog):
         pb_link = urllib.parse.urlunparse(pb_url)
         return pb_link
 
-    def _get_auction_embeds(self, raw_auctions):
-        embeds = []
+    async def _get_auctions(self):
+        """
+        Returns the active auctions, or None if the API couldn't be reached.
+        Results are cached for `auctions_ttl` seconds, and concurrent callers
+        share a single request while the cache is being refreshed.
+        """
+        if (
+            self._auctions is not None
+            and time.monotonic() - self._auctions_fetched < self.auctions_ttl
+        ):
+            return self._auctions
+
+        if self._auctions_refresh is None:
+            self._auctions_refresh = asyncio.ensure_future(self._fetch_auctions())
+        # Shielded so a cancelled command doesn't cancel the request for everyone else.
+        return await asyncio.shield(self._auctions_refresh)
+
+    async def _fetch_auctions(self):
+        try:
+            async with aiohttp.request("GET", self.auctions_endpoint) as api_response:
+                if api_response.status != 200:
+                    return None
+
+                raw_auctions = (await api_response.json())["auctions"]
+
+            loop = asyncio.get_running_loop()
+            self._auctions = await loop.run_in_executor(
+                self.thread_pool, self._parse_auctions, raw_auctions
+            )
+            self._auctions_fetched = time.monotonic()
+            return self._auctions
+        finally:
+            self._auctions_refresh = None
+
+    def _parse_auctions(self, raw_auctions):
+        auctions = []
         for auction in raw_auctions:
-            soup = BeautifulSoup(auction, "html.parser")
+            soup = parse_html(auction)
             current_bid = soup.find(class_="coins").text
             number_of_bids = soup.div.div.find(title="Bids").next_sibling.strip()
             title = soup.h4.text
@@ -992,9 +1046,18 @@ class MXL(commands.Cog):
             started_by = soup.find(class_="username").text
             description = f"Started by: {started_by}\nCurrent bids: {number_of_bids}\nCurrent bid: {current_bid} TG\nTime left: {time_left}"
             image = soup.find(title="Image")
-            embed = discord.Embed(title=title, description=description)
-            if image is not None:
-                embed.set_image(url=image["data-featherlight"])
-            embeds.append(embed)
+            auctions.append(
+                Auction(
+                    title=title,
+                    description=description,
+                    image=image["data-featherlight"] if image is not None else None,
+                )
+            )
+
+        return auctions
 
-        return embeds
+    def _auction_embed(self, auction):
+        embed = discord.Embed(title=auction.title, description=auction.description)
+        if auction.image is not None:
+            embed.set_image(url=auction.image)
+        return embed
@@ -0,0 +1,89 @@
+import enum
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+# BeautifulSoup tree builder for whole pages - lxml's is several times faster.
+PARSER = "html.parser" if lxml is None else "lxml"
+
+
+class ArmoryPage(enum.Enum):
+    OK = 0
+    LOGGED_OUT = 1
+    NOT_FOUND = 2
+    PRIVATE = 3
+
+
+def parse_html(markup):
+    return BeautifulSoup(markup, PARSER)
+
+
+def parse_fragment(markup):
+    """
+    Returns the first tag of a small markup fragment, such as a scraped item's html.
+    html.parser is used so the fragment isn't wrapped in <html><body> and
+    serializes back the same way it always has.
+    """
+    return BeautifulSoup(markup, "html.parser").find()
+
+
+def parse_armory_page(page):
+    """
+    Returns the status of a character's armory page and its item-wrapper tags.
+    Each tag's grandparent, which the item scraper reads the quantity from, is kept.
+    """
+    if lxml is None or not page.strip():
+        return _parse_armory_page_bs4(page)
+    return _parse_armory_page_lxml(page)
+
+
+def _parse_armory_page_bs4(page):
+    dom = BeautifulSoup(page, "html.parser")
+    if dom.find(action="login.php"):
+        return ArmoryPage.LOGGED_OUT, []
+
+    if dom.div.div and "not found" in dom.div.div.text:
+        return ArmoryPage.NOT_FOUND, []
+
+    if dom.h1 and "not allowed" in dom.h1.text:
+        return ArmoryPage.PRIVATE, []
+
+    return ArmoryPage.OK, dom.find_all(class_="item-wrapper")
+
+
+def _parse_armory_page_lxml(page):
+    # The page is only walked with lxml. Just the markup around the items -
+    # everything up to each item-wrapper's grandparent - becomes a BeautifulSoup tree.
+    root = lxml.html.document_fromstring(page)
+    if root.xpath("//*[@action='login.php']"):
+        return ArmoryPage.LOGGED_OUT, []
+
+    first_div = next(root.iter("div"), None)
+    inner_div = None
+    if first_div is not None:
+        inner_div = next(first_div.iterdescendants("div"), None)
+    if inner_div is not None and "not found" in inner_div.text_content():
+        return ArmoryPage.NOT_FOUND, []
+
+    heading = next(root.iter("h1"), None)
+    if heading is not None and "not allowed" in heading.text_content():
+        return ArmoryPage.PRIVATE, []
+
+    containers = dict.fromkeys(
+        wrapper.getparent().getparent() for wrapper in root.find_class("item-wrapper")
+    )
+    # Containers nested in another one are already part of its markup.
+    outermost = [
+        container
+        for container in containers
+        if not any(ancestor in containers for ancestor in container.iterancestors())
+    ]
+    items_markup = "".join(
+        lxml.html.tostring(container, encoding="unicode", with_tail=False)
+        for container in outermost
+    )
+    return ArmoryPage.OK, parse_html(items_markup).find_all(class_="item-wrapper")
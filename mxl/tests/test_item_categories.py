@@ -0,0 +1,63 @@
+import collections
+
+from mxl.constants import (
+    AMULETS,
+    ITEM_CATEGORIES,
+    JEWELS,
+    MOS,
+    QUIVERS,
+    RINGS,
+    RUNEWORDS,
+    SSSU_ITEMS,
+    SSU_ITEMS,
+    SU_ITEMS,
+)
+
+# The membership checks _scrape_items made one after another before the index.
+SEQUENTIAL_CHECKS = (
+    ("su", SU_ITEMS),
+    ("other", ["Jewel"]),
+    ("ssu", SSU_ITEMS),
+    ("sssu", SSSU_ITEMS),
+    ("runewords", RUNEWORDS),
+    ("amulets", AMULETS),
+    ("rings", RINGS),
+    ("jewels", JEWELS),
+    ("quivers", QUIVERS),
+    ("mos", MOS),
+)
+
+
+def classify_sequentially(name):
+    for category, names in SEQUENTIAL_CHECKS:
+        if name in names:
+            return category
+    return None
+
+
+def all_names():
+    return {name for _, names in SEQUENTIAL_CHECKS for name in names}
+
+
+def test_every_name_keeps_its_sequential_category():
+    for name in all_names():
+        assert ITEM_CATEGORIES[name] == classify_sequentially(name), name
+
+
+def test_index_has_no_other_names():
+    assert set(ITEM_CATEGORIES) == all_names()
+
+
+def test_repeated_names_keep_the_first_match():
+    occurrences = collections.Counter(
+        name for _, names in SEQUENTIAL_CHECKS for name in names
+    )
+    repeated = [name for name, count in occurrences.items() if count > 1]
+    assert repeated
+    for name in repeated:
+        assert ITEM_CATEGORIES[name] == classify_sequentially(name), name
+
+
+def test_unknown_names_are_not_classified():
+    assert ITEM_CATEGORIES.get("Not An Item") is None
+    assert classify_sequentially("Not An Item") is None
@@ -0,0 +1,87 @@
+import pytest
+
+pytest.importorskip("redbot")
+
+from mxl.constants import CHARMS, IGNORED_ITEMS, SETS, SU_ITEMS, TROPHIES
+from mxl.mxl import MXL
+from mxl.parsing import parse_armory_page
+
+
+def armory_page(*items):
+    """Builds an armory page from (colour, name, details, quantity) tuples."""
+    rows = "".join(
+        f'<tr><td><span>[{quantity}x]</span><div class="cell"><div class="item-wrapper">'
+        f'<span class="{colour}">{name}<br></span><div class="color-grey">{details}</div>'
+        f'<img src="a.png"></div></div></td></tr>'
+        for colour, name, details, quantity in items
+    )
+    return f"<html><body><div><div>Character</div><table>{rows}</table></div></body></html>"
+
+
+def scrape(*items, crafted_as_base=False):
+    _, item_dump = parse_armory_page(armory_page(*items))
+    # _scrape_items doesn't touch the cog's state.
+    scraped = MXL._scrape_items(
+        None, item_dump, "Character", {"crafted_as_base": crafted_as_base}
+    )
+    return [
+        (item.category, item.name, item.quantity, item.set_name) for item in scraped
+    ]
+
+
+def test_ignored_items_are_skipped():
+    assert scrape(("color-white", IGNORED_ITEMS[0], "", 1)) == []
+
+
+def test_set_items():
+    set_item, set_name = next(iter(SETS.items()))
+    assert scrape(
+        ("color-green", set_item, "", 1),
+        ("color-green", "Unlisted Piece [Some Set]", "", 1),
+    ) == [
+        ("sets", set_item, 1, set_name),
+        ("sets", "Unlisted Piece", 1, "Some Set"),
+    ]
+
+
+def test_indexed_names_win_over_the_colour_checks():
+    # White and blue items are runeword bases unless the index knows them.
+    assert scrape(("color-white", SU_ITEMS[0], "", 1)) == [("su", SU_ITEMS[0], 1, None)]
+
+
+def test_runeword_and_shrine_bases():
+    assert scrape(
+        ("color-blue", "Superior Long Sword", "", 1),
+        ("color-white", "Great Axe", "Ethereal", 1),
+        ("color-yellow", "Rare Ring Mail", "", 1),
+    ) == [
+        ("rw_bases", "Long Sword", 1, None),
+        ("rw_bases", "Great Axe [eth]", 1, None),
+        ("shrine_bases", "Rare Ring Mail", 1, None),
+    ]
+
+
+def test_charms_come_before_crafted_items():
+    assert scrape(
+        ("color-orange", CHARMS[0], "", 1),
+        ("color-orange", "Crafted Blade", "", 1),
+    ) == [
+        ("charms", CHARMS[0], 1, None),
+        ("crafted", "Crafted Blade", 1, None),
+    ]
+
+
+def test_crafted_as_base():
+    assert scrape(("color-orange", "Crafted Blade", "", 1), crafted_as_base=True) == [
+        ("shrine_bases", "Crafted Blade", 1, None)
+    ]
+
+
+def test_trophies_and_other_items_keep_their_quantity():
+    assert scrape(
+        ("color-orange", TROPHIES[0], "", 2),
+        ("color-gold", "Something Else", "", 3),
+    ) == [
+        ("trophies", TROPHIES[0], 2, None),
+        ("other", "Something Else", 3, None),
+    ]
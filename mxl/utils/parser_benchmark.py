@@ -0,0 +1,99 @@
+"""
+Compares the html.parser tree builder with the parsing layer the cog uses, over
+saved armory (tsw.vn.cz/acc/char.php) and tradecenter (tradegold.php) pages.
+Save the pages from a browser, then run from the repository root:
+
+    python -m mxl.utils.parser_benchmark char1.html char2.html tradegold.html
+
+Without saved pages, `--write-synthetic armory.html` writes a generated armory
+page shaped like the real ones (800 items after a few thousand lines of
+navigation markup) to benchmark against.
+"""
+
+import argparse
+import time
+
+from bs4 import BeautifulSoup
+
+from ..parsing import PARSER, parse_armory_page, parse_html
+
+
+def synthetic_armory_page(items=800, filler=3000):
+    rows = "".join(
+        f'<tr><td><span>[{i % 3 + 1}x]</span><div class="cell">'
+        f'<div class="item-wrapper"><span class="color-gold">Item {i}<br>'
+        f'Superior</span><img src="img/item{i}.png"></div></div></td></tr>'
+        for i in range(items)
+    )
+    navigation = "".join(
+        f'<p class="nav">nav {i} <a href="#{i}">link</a></p>' for i in range(filler)
+    )
+    return (
+        "<html><head><script>var armory = {};</script></head><body>"
+        f'<div id="main"><div>Character Synthetic</div>{navigation}'
+        f"<table>{rows}</table></div></body></html>"
+    )
+
+
+def best_of(repeat, func, *args):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def html_parser_armory(page):
+    return BeautifulSoup(page, "html.parser").find_all(class_="item-wrapper")
+
+
+def html_parser_page(page):
+    return BeautifulSoup(page, "html.parser")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pages", nargs="*", help="saved armory/tradecenter pages")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument(
+        "--write-synthetic",
+        metavar="PATH",
+        help="write a generated armory page to PATH and benchmark it too",
+    )
+    args = parser.parse_args()
+    if args.write_synthetic:
+        with open(args.write_synthetic, "w", encoding="utf-8") as f:
+            f.write(synthetic_armory_page())
+        args.pages.append(args.write_synthetic)
+    if not args.pages:
+        parser.error("pass saved pages or --write-synthetic")
+
+    print(f"Parser layer backend: {PARSER}")
+    print(
+        f"{'page':<32}{'items':>7}{'html.parser ms':>16}{'layer ms':>10}{'speedup':>9}"
+    )
+    for filename in args.pages:
+        with open(filename, encoding="utf-8", errors="replace") as f:
+            page = f.read()
+
+        if "item-wrapper" in page:
+            baseline = html_parser_armory
+            candidate = parse_armory_page
+            items = len(html_parser_armory(page))
+            _, layer_items = parse_armory_page(page)
+            if len(layer_items) != items:
+                print(
+                    f"{filename}: parser layer found {len(layer_items)} items, expected {items}"
+                )
+        else:
+            baseline = html_parser_page
+            candidate = parse_html
+            items = 0
+
+        baseline_time = best_of(args.repeat, baseline, page)
+        candidate_time = best_of(args.repeat, candidate, page)
+        print(
+            f"{filename[-32:]:<32}{items:>7}{baseline_time * 1000:>16.1f}"
+            f"{candidate_time * 1000:>10.1f}{baseline_time / candidate_time:>8.1f}x"
+        )
@@ -5,6 +5,7 @@ from .sfx import SFX
 
 async def setup(bot: Red) -> None:
     cog = SFX(bot)
+    await cog.initialize()
     bot.add_cog(cog)
 
 
@@ -1,10 +1,45 @@
+import abc
+import asyncio
+import os
+import shutil
 import urllib.parse
 
 import aiofiles
 import aiohttp
 
 
-class TTSAPI:
+class TTSProvider(abc.ABC):
+    """
+    A text-to-speech backend. Voices and speeds are the ones users pick with
+    `myvoice`/`myspeed` (see TTSAPI.voices and TTSAPI.speeds); each provider
+    maps them onto whatever its engine understands.
+    """
+
+    name = None
+    # Whether clips come over the network, and so count as fetched bytes.
+    remote = False
+
+    @property
+    def available(self):
+        return True
+
+    @abc.abstractmethod
+    def limit(self, voice):
+        """The longest text, in characters, the voice can say in one request."""
+
+    @abc.abstractmethod
+    async def get_audio(self, text, voice, speed, file):
+        """Writes the spoken text to `file` as MP3."""
+
+
+class TTSAPI(TTSProvider):
+    """The Naver dictionary voice endpoint."""
+
+    name = "naver"
+    remote = True
+    endpoint = "https://dict.naver.com/api/nvoice?service=dictionary&speech_fmt=mp3&text={}&speaker={}&speed={}"
+    retries = 3
+    backoff = 0.5
 
     voices = {
         "clara": {"language": "english", "gender": "female", "limit": 600},
@@ -29,13 +64,127 @@ class TTSAPI:
 
     speeds = {0: 5, 1: 4, 2: 3, 3: 2, 4: 1, 5: 0, 6: -1, 7: -2, 8: -3, 9: -4, 10: -5}
 
+    def __init__(self, session):
+        self.session = session
+
+    def limit(self, voice):
+        return self.voices[voice]["limit"]
+
     async def get_audio(self, text, voice, speed, file):
-        session = aiohttp.ClientSession()
         wrapped_text = urllib.parse.quote(text)
-        async with session.get(
-            f"https://dict.naver.com/api/nvoice?service=dictionary&speech_fmt=mp3&text={wrapped_text}&speaker={voice}&speed={speed}"
-        ) as request:
-            f = await aiofiles.open(file, mode="wb")
-            await f.write(await request.read())
-            await f.close()
-        await session.close()
+        url = self.endpoint.format(wrapped_text, voice, speed)
+        for attempt in range(self.retries):
+            try:
+                async with self.session.get(url) as request:
+                    request.raise_for_status()
+                    data = await request.read()
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Only failures that may go away are retried, not 4xx answers.
+                if isinstance(e, aiohttp.ClientResponseError) and e.status < 500:
+                    raise
+                if attempt == self.retries - 1:
+                    raise
+                await asyncio.sleep(self.backoff * 2**attempt)
+        f = await aiofiles.open(file, mode="wb")
+        await f.write(data)
+        await f.close()
+
+
+class LocalTTS(TTSProvider):
+    """
+    An offline provider that runs espeak-ng (or espeak) as a subprocess and
+    encodes its WAV output to MP3 with ffmpeg.
+    """
+
+    name = "local"
+    languages = {
+        "english": "en",
+        "spanish": "es",
+        "japanese": "ja",
+        "korean": "ko",
+        "chinese (simplified)": "cmn",
+        "chinese": "cmn",
+        "chinese (traditional)": "yue",
+    }
+    max_length = 1000
+    timeout = 30
+
+    def __init__(self):
+        self.executable = shutil.which("espeak-ng") or shutil.which("espeak")
+        self.ffmpeg = shutil.which("ffmpeg")
+
+    @property
+    def available(self):
+        return self.executable is not None and self.ffmpeg is not None
+
+    def limit(self, voice):
+        return self.max_length
+
+    def _voice(self, voice):
+        info = TTSAPI.voices[voice]
+        variant = "f3" if info["gender"] == "female" else "m3"
+        return f"{self.languages[info['language']]}+{variant}"
+
+    async def get_audio(self, text, voice, speed, file):
+        # Stored speeds run from 5 (slowest) to -5 (fastest); espeak wants words
+        # per minute around its default of 175.
+        words_per_minute = 175 - speed * 20
+        wav_file = file + ".wav"
+        try:
+            await self._run(
+                [
+                    self.executable,
+                    "-v",
+                    self._voice(voice),
+                    "-s",
+                    str(words_per_minute),
+                    "-w",
+                    wav_file,
+                    "--stdin",
+                ],
+                text.encode("utf-8"),
+            )
+            # Clips are MP3 like Naver's, so padding and joining them stays a
+            # frame splice and the cache's .mp3 names hold.
+            await self._run(
+                [
+                    self.ffmpeg,
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-i",
+                    wav_file,
+                    "-b:a",
+                    "64k",
+                    "-f",
+                    "mp3",
+                    file,
+                ]
+            )
+        finally:
+            if os.path.exists(wav_file):
+                os.remove(wav_file)
+
+    async def _run(self, args, stdin=None):
+        process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=(
+                asyncio.subprocess.DEVNULL if stdin is None else asyncio.subprocess.PIPE
+            ),
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            _, stderr = await asyncio.wait_for(
+                process.communicate(stdin), timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise
+        if process.returncode != 0:
+            raise RuntimeError(
+                f"{args[0]} exited with {process.returncode}: "
+                f"{stderr.decode(errors='replace').strip()}"
+            )
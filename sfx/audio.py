@@ -0,0 +1,265 @@
+import asyncio
+import concurrent.futures
+import functools
+import math
+import os
+import wave
+
+import pydub
+import pydub.silence
+
+INGEST_FRAME_RATE = 48000
+INGEST_CHANNELS = 2
+INGEST_BITRATE = "128k"
+INGEST_TARGET_DBFS = -16.0
+INGEST_PEAK_DBFS = -1.0
+INGEST_SILENCE_DBFS = -50.0
+
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],  # MPEG-2.5
+}
+
+
+def _id3_size(data):
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = 0
+    for byte in data[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _mp3_frame_info(data, offset):
+    """Parses a Layer III frame header, raising ValueError if there isn't one."""
+    if offset + 4 > len(data):
+        raise ValueError("Truncated MP3 frame header.")
+    b0, b1, b2, b3 = data[offset : offset + 4]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        raise ValueError("Missing MP3 frame sync.")
+    version = (b1 >> 3) & 0x03
+    layer = (b1 >> 1) & 0x03
+    bitrate_index = b2 >> 4
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer != 1:
+        raise ValueError("Only MPEG Layer III is supported.")
+    if bitrate_index in (0, 15) or sample_rate_index == 3:
+        raise ValueError("Unsupported MP3 bitrate or sample rate.")
+    mpeg1 = version == 3
+    bitrate = MP3_BITRATES[1 if mpeg1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][sample_rate_index]
+    mono = (b3 >> 6) == 3
+    length = (144 if mpeg1 else 72) * bitrate // sample_rate + ((b2 >> 1) & 0x01)
+    if mpeg1:
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+    return {
+        "header": bytes((b0, b1, b2, b3)),
+        "length": length,
+        "sample_rate": sample_rate,
+        "samples": 1152 if mpeg1 else 576,
+        "side_info": side_info,
+    }
+
+
+def _is_vbr_header(data, offset, frame):
+    tag_offset = offset + 4 + frame["side_info"]
+    return (
+        data[tag_offset : tag_offset + 4] in (b"Xing", b"Info")
+        or data[offset + 36 : offset + 40] == b"VBRI"
+    )
+
+
+@functools.lru_cache(maxsize=32)
+def _silent_mp3_frames(header, frame_length, count):
+    # A frame whose side info and main data are all zero decodes to silence, so
+    # the lead-in can be built from the clip's own header without an encoder.
+    silent_header = bytes(
+        (header[0], header[1] | 0x01, header[2] & ~0x02 & 0xFF, header[3])
+    )
+    return (silent_header + bytes(frame_length - 4)) * count
+
+
+def _mp3_audio_start(data):
+    """Returns the offset and info of the first frame after any ID3v2/VBR header."""
+    offset = _id3_size(data)
+    frame = _mp3_frame_info(data, offset)
+    if _is_vbr_header(data, offset, frame):
+        offset += frame["length"]
+        frame = _mp3_frame_info(data, offset)
+    return offset, frame
+
+
+def _pad_mp3(data, padding):
+    offset, frame = _mp3_audio_start(data)
+    # The silent frames never use the padding slot.
+    frame_length = frame["length"] - ((frame["header"][2] >> 1) & 0x01)
+    count = math.ceil(padding * frame["sample_rate"] / 1000 / frame["samples"])
+    silence = _silent_mp3_frames(frame["header"], frame_length, count)
+    return data[: _id3_size(data)] + silence + data[offset:]
+
+
+def _pad_wav(filepath, padding, output):
+    with wave.open(filepath, "rb") as source:
+        params = source.getparams()
+        frames = source.readframes(params.nframes)
+    silent_frames = params.framerate * padding // 1000
+    # 8-bit PCM is unsigned, so its silence is the midpoint rather than zero.
+    silent_sample = b"\x80" if params.sampwidth == 1 else b"\x00"
+    silence = silent_sample * (silent_frames * params.nchannels * params.sampwidth)
+    with wave.open(output, "wb") as destination:
+        destination.setparams(params)
+        destination.writeframes(silence + frames)
+
+
+def _pad_with_pydub(filepath, padding):
+    audio_data = pydub.AudioSegment.from_file(filepath)
+    silence = pydub.AudioSegment.silent(duration=padding)
+    padded_audio = silence + audio_data
+    padded_audio.export(filepath)
+
+
+def pad_audio(filepath, padding):
+    """
+    Prepends `padding` milliseconds of silence to the file in place.
+
+    MP3 and PCM WAV files are spliced without re-encoding; anything else goes
+    through pydub, which raises CouldntDecodeError for data that isn't audio.
+    """
+    with open(filepath, "rb") as f:
+        data = f.read()
+
+    output = filepath + ".pad"
+    try:
+        if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+            _pad_wav(filepath, padding, output)
+        else:
+            padded = _pad_mp3(data, padding)
+            with open(output, "wb") as f:
+                f.write(padded)
+    except (ValueError, EOFError, wave.Error):
+        if os.path.exists(output):
+            os.remove(output)
+        _pad_with_pydub(filepath, padding)
+        return
+    os.replace(output, filepath)
+
+
+def concat_audio(filepaths, output):
+    """
+    Joins the clips in order into `output`. MP3 clips are joined frame by
+    frame; anything else is decoded and re-encoded with pydub.
+    """
+    try:
+        parts = []
+        for filepath in filepaths:
+            with open(filepath, "rb") as f:
+                data = f.read()
+            offset, _ = _mp3_audio_start(data)
+            parts.append(data[offset:])
+    except ValueError:
+        combined = pydub.AudioSegment.empty()
+        for filepath in filepaths:
+            combined += pydub.AudioSegment.from_file(filepath)
+        combined.export(output)
+        return
+    with open(output, "wb") as f:
+        for part in parts:
+            f.write(part)
+
+
+def ingest_sound(source, destination, padding):
+    """
+    Converts an uploaded sound into the stored format: trimmed of leading and
+    trailing silence, loudness-normalized without clipping, padded, and encoded
+    as MP3 at one fixed profile. Returns the stored duration and size.
+    """
+    audio_data = pydub.AudioSegment.from_file(source)
+    start = pydub.silence.detect_leading_silence(
+        audio_data, silence_threshold=INGEST_SILENCE_DBFS
+    )
+    end = len(audio_data) - pydub.silence.detect_leading_silence(
+        audio_data.reverse(), silence_threshold=INGEST_SILENCE_DBFS
+    )
+    if end > start:
+        audio_data = audio_data[start:end]
+
+    if audio_data.dBFS != float("-inf"):
+        gain = min(
+            INGEST_TARGET_DBFS - audio_data.dBFS,
+            INGEST_PEAK_DBFS - audio_data.max_dBFS,
+        )
+        audio_data = audio_data.apply_gain(gain)
+
+    audio_data = audio_data.set_frame_rate(INGEST_FRAME_RATE).set_channels(
+        INGEST_CHANNELS
+    )
+    padded_audio = (
+        pydub.AudioSegment.silent(
+            duration=padding, frame_rate=INGEST_FRAME_RATE
+        ).set_channels(INGEST_CHANNELS)
+        + audio_data
+    )
+
+    output = destination + ".part"
+    try:
+        padded_audio.export(output, format="mp3", bitrate=INGEST_BITRATE)
+        os.replace(output, destination)
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
+    return {"duration": len(padded_audio), "size": os.path.getsize(destination)}
+
+
+class AudioWorker:
+    """Runs blocking pydub/ffmpeg transforms in a bounded thread pool."""
+
+    def __init__(self, workers=2, max_pending=32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self.active = 0
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="sfx_audio_"
+        )
+
+    @property
+    def queued(self):
+        return self.pending - self.active
+
+    def resize(self, workers):
+        old_pool = self._pool
+        self.workers = workers
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="sfx_audio_"
+        )
+        old_pool.shutdown(wait=False)
+
+    def _track(self, func, *args):
+        self.active += 1
+        try:
+            return func(*args)
+        finally:
+            self.active -= 1
+
+    async def run(self, func, *args):
+        async with self._slots:
+            self.pending += 1
+            try:
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(
+                    self._pool, functools.partial(self._track, func, *args)
+                )
+            finally:
+                self.pending -= 1
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
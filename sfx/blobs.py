@@ -0,0 +1,55 @@
+import collections
+import os
+import re
+
+from .bulk import hash_file
+
+DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+class BlobStore:
+    """
+    Stores sound files once each, named by the SHA-256 of their contents.
+    Reference counts live in memory and are rebuilt from config on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.refs = collections.Counter()
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def is_digest(value):
+        return DIGEST.fullmatch(value) is not None
+
+    def path_for(self, digest):
+        return os.path.join(self.path, digest + ".mp3")
+
+    def put(self, filepath, digest=None):
+        """
+        Moves a file into the store and returns its digest. If the same
+        contents are already stored, the file is dropped instead. Pass the
+        digest if it's already known, and hold a reference to it first so the
+        stored copy can't be released in the meantime.
+        Blocking; run it in the audio worker.
+        """
+        if digest is None:
+            digest = hash_file(filepath)
+        blob_path = self.path_for(digest)
+        if os.path.exists(blob_path):
+            os.remove(filepath)
+        else:
+            os.replace(filepath, blob_path)
+        return digest
+
+    def add_ref(self, digest):
+        self.refs[digest] += 1
+
+    def release(self, digest):
+        self.refs[digest] -= 1
+        if self.refs[digest] > 0:
+            return
+        del self.refs[digest]
+        blob_path = self.path_for(digest)
+        if os.path.exists(blob_path):
+            os.remove(blob_path)
@@ -0,0 +1,122 @@
+import hashlib
+import os
+import secrets
+import tarfile
+import zipfile
+
+SOUND_EXTENSIONS = (".wav", ".mp3")
+MAX_ARCHIVE_BYTES = 200 * 1024 * 1024
+# Limits on what one import may unpack, so a small, highly compressed archive
+# can't fill the disk or queue thousands of ffmpeg jobs.
+MAX_IMPORT_SOUNDS = 200
+MAX_IMPORT_BYTES = 250 * 1024 * 1024
+
+
+def hash_file(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sound_name(filename):
+    stem, extension = os.path.splitext(os.path.basename(filename))
+    if extension.lower() not in SOUND_EXTENSIONS or not stem:
+        return None
+    return "_".join(stem.split())
+
+
+def _copy_member(source, directory, extension, max_bytes):
+    filepath = os.path.join(directory, secrets.token_hex(8) + extension)
+    size = 0
+    with open(filepath, "wb") as destination:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                break
+            destination.write(chunk)
+    if size > max_bytes:
+        os.remove(filepath)
+        return None
+    return filepath
+
+
+def _archive_members(archive_path):
+    """Yields (filename, size, open_member) for each regular file in the archive."""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, lambda i=info: archive.open(i)
+    elif tarfile.is_tarfile(archive_path):
+        with tarfile.open(archive_path) as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, info.size, lambda i=info: archive.extractfile(i)
+    else:
+        raise ValueError("Not a .zip or .tar archive.")
+
+
+def extract_sounds(
+    archive_path,
+    directory,
+    max_bytes,
+    max_sounds=MAX_IMPORT_SOUNDS,
+    max_total_bytes=MAX_IMPORT_BYTES,
+):
+    """
+    Copies the .wav and .mp3 members of a zip or tar archive into `directory`
+    under random names. Only base names are used, so member paths can't escape
+    it. Extraction stops once `max_sounds` sounds or `max_total_bytes` bytes
+    have been written. Returns a list of (name, filepath, sha256) tuples and
+    whether every sound in the archive was extracted.
+    """
+    sounds = []
+    remaining = max_total_bytes
+    for filename, size, open_member in _archive_members(archive_path):
+        name = sound_name(filename)
+        if name is None or size > max_bytes:
+            continue
+        if len(sounds) >= max_sounds or size > remaining:
+            return sounds, False
+        extension = os.path.splitext(filename)[1].lower()
+        with open_member() as member:
+            filepath = _copy_member(
+                member, directory, extension, min(max_bytes, remaining)
+            )
+        if filepath is None:
+            # The member was bigger than it claimed to be.
+            if remaining < max_bytes:
+                return sounds, False
+            continue
+        remaining -= os.path.getsize(filepath)
+        sounds.append((name, filepath, hash_file(filepath)))
+    return sounds, True
+
+
+def scan_sounds(
+    directory,
+    max_bytes,
+    max_sounds=MAX_IMPORT_SOUNDS,
+    max_total_bytes=MAX_IMPORT_BYTES,
+):
+    """
+    Returns (name, filepath, sha256) for the .wav and .mp3 files in a directory,
+    up to the same limits as extract_sounds, and whether every file was included.
+    """
+    sounds = []
+    remaining = max_total_bytes
+    for filename in sorted(os.listdir(directory)):
+        filepath = os.path.join(directory, filename)
+        name = sound_name(filename)
+        if name is None or not os.path.isfile(filepath):
+            continue
+        size = os.path.getsize(filepath)
+        if size > max_bytes:
+            continue
+        if len(sounds) >= max_sounds or size > remaining:
+            return sounds, False
+        remaining -= size
+        sounds.append((name, filepath, hash_file(filepath)))
+    return sounds, True
@@ -0,0 +1,118 @@
+import collections
+import hashlib
+import os
+
+
+class TTSCache:
+    """On-disk LRU cache of padded TTS clips, keyed by what was spoken and how."""
+
+    def __init__(self, path, max_entries=500, max_bytes=100 * 1024 * 1024):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.entries = collections.OrderedDict()
+        self.total_bytes = 0
+        # Clips that are queued or playing; eviction and clear() leave them alone.
+        self.pins = collections.Counter()
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self._load()
+
+    @staticmethod
+    def key(provider, text, voice, speed, padding):
+        raw = f"{provider}\0{voice}\0{speed}\0{padding}\0{text}".encode("utf-8")
+        return hashlib.sha256(raw).hexdigest()
+
+    def _load(self):
+        # Rebuild the LRU order from the files left by a previous run, oldest first.
+        found = []
+        for filename in os.listdir(self.path):
+            filepath = os.path.join(self.path, filename)
+            if not os.path.isfile(filepath):
+                continue
+            stat = os.stat(filepath)
+            found.append((stat.st_mtime, os.path.splitext(filename)[0], stat.st_size))
+        for _, key, size in sorted(found):
+            self.entries[key] = size
+            self.total_bytes += size
+        self._evict()
+
+    @staticmethod
+    def _key(filepath):
+        return os.path.splitext(os.path.basename(filepath))[0]
+
+    def _filepath(self, key):
+        return os.path.join(self.path, key + ".mp3")
+
+    def get(self, key):
+        """Returns the cached clip's path, or None if it isn't cached."""
+        filepath = self._filepath(key)
+        if key not in self.entries or not os.path.exists(filepath):
+            self._forget(key)
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        os.utime(filepath)
+        self.hits += 1
+        return filepath
+
+    def put(self, key, filepath):
+        """Moves an already padded clip into the cache and returns its new path."""
+        cached_path = self._filepath(key)
+        os.replace(filepath, cached_path)
+        self._forget(key)
+        size = os.path.getsize(cached_path)
+        self.entries[key] = size
+        self.total_bytes += size
+        self._evict(keep=key)
+        return cached_path
+
+    def pin(self, filepath):
+        self.pins[self._key(filepath)] += 1
+
+    def unpin(self, filepath):
+        key = self._key(filepath)
+        self.pins[key] -= 1
+        if self.pins[key] <= 0:
+            del self.pins[key]
+            self._evict()
+
+    def clear(self):
+        for key in list(self.entries):
+            if not self.pins[key]:
+                self._remove(key)
+        self.hits = 0
+        self.misses = 0
+
+    def _forget(self, key):
+        size = self.entries.pop(key, None)
+        if size is not None:
+            self.total_bytes -= size
+
+    def _remove(self, key):
+        self._forget(key)
+        filepath = self._filepath(key)
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    def _evict(self, keep=None):
+        for key in list(self.entries):
+            if (
+                len(self.entries) <= self.max_entries
+                and self.total_bytes <= self.max_bytes
+            ):
+                break
+            if key != keep and not self.pins[key]:
+                self._remove(key)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
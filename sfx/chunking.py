@@ -0,0 +1,48 @@
+import re
+
+SENTENCE_END = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def _split_words(sentence, limit):
+    chunk = ""
+    for word in sentence.split():
+        while len(word) > limit:
+            if chunk:
+                yield chunk
+                chunk = ""
+            yield word[:limit]
+            word = word[limit:]
+        if not word:
+            continue
+        if chunk and len(chunk) + 1 + len(word) > limit:
+            yield chunk
+            chunk = word
+        else:
+            chunk = f"{chunk} {word}" if chunk else word
+    if chunk:
+        yield chunk
+
+
+def split_text(text, limit):
+    """
+    Splits text into chunks of at most `limit` characters, preferring sentence
+    boundaries, then word boundaries, and only cutting words as a last resort.
+    """
+    chunks = []
+    chunk = ""
+    for sentence in SENTENCE_END.split(text.strip()):
+        if not sentence:
+            continue
+        if len(sentence) > limit:
+            if chunk:
+                chunks.append(chunk)
+                chunk = ""
+            chunks.extend(_split_words(sentence, limit))
+        elif chunk and len(chunk) + 1 + len(sentence) > limit:
+            chunks.append(chunk)
+            chunk = sentence
+        else:
+            chunk = f"{chunk} {sentence}" if chunk else sentence
+    if chunk:
+        chunks.append(chunk)
+    return chunks
@@ -0,0 +1,134 @@
+import asyncio
+import os
+
+import aiofiles
+import aiohttp
+
+AUDIO_CONTENT_TYPES = (
+    "audio/",
+    "application/octet-stream",
+    "binary/octet-stream",
+)
+ARCHIVE_CONTENT_TYPES = (
+    "application/zip",
+    "application/x-zip-compressed",
+    "application/x-tar",
+    "application/gzip",
+    "application/x-gzip",
+    "application/x-bzip2",
+    "application/x-xz",
+    "application/octet-stream",
+    "binary/octet-stream",
+)
+
+
+# Archives can be large, so only a stalled connection aborts their download.
+ARCHIVE_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=5, sock_read=30)
+
+
+class DownloadError(Exception):
+    pass
+
+
+def _looks_like_audio(head):
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return True
+    if head[:3] == b"ID3":
+        return True
+    return len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0
+
+
+async def _download(
+    session,
+    url,
+    filepath,
+    max_bytes,
+    content_types,
+    sniff,
+    kind,
+    chunk_size,
+    timeout=None,
+):
+    partial_path = filepath + ".part"
+    too_big = f"That {kind} is too big, the limit is **{max_bytes // 1024} KiB**."
+    try:
+        options = {} if timeout is None else {"timeout": timeout}
+        async with session.get(url, **options) as response:
+            if response.status != 200:
+                raise DownloadError(
+                    f"The server responded with status code {response.status}."
+                )
+            content_type = response.headers.get("Content-Type", "").lower()
+            if content_type and not content_type.startswith(content_types):
+                raise DownloadError(
+                    f"That link doesn't point to a supported {kind} file."
+                )
+            if response.content_length and response.content_length > max_bytes:
+                raise DownloadError(too_big)
+
+            size = 0
+            head = b""
+            async with aiofiles.open(partial_path, mode="wb") as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise DownloadError(too_big)
+                    if sniff is not None and len(head) < 12:
+                        head += chunk[: 12 - len(head)]
+                        if len(head) >= 12 and not sniff(head):
+                            raise DownloadError(
+                                "That file doesn't look like a .wav or .mp3 sound."
+                            )
+                    await f.write(chunk)
+
+            if sniff is not None and not sniff(head):
+                raise DownloadError("That file doesn't look like a .wav or .mp3 sound.")
+        os.replace(partial_path, filepath)
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        raise DownloadError(f"I couldn't download that {kind}, please try again later.")
+    finally:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+
+
+async def download_audio(session, url, filepath, max_bytes, chunk_size=64 * 1024):
+    """
+    Streams `url` into `filepath`, giving up as soon as it's clearly not a
+    usable sound. The file only appears at `filepath` once it's complete.
+    """
+    await _download(
+        session,
+        url,
+        filepath,
+        max_bytes,
+        AUDIO_CONTENT_TYPES,
+        _looks_like_audio,
+        "sound",
+        chunk_size,
+    )
+
+
+async def download_archive(
+    session,
+    url,
+    filepath,
+    max_bytes,
+    chunk_size=64 * 1024,
+    timeout=ARCHIVE_TIMEOUT,
+):
+    """
+    Streams an archive at `url` into `filepath`. Its contents are checked when
+    it's opened, since a plain tar can't be recognized from its first bytes.
+    Uses `timeout` instead of the session's, which is too short for big files.
+    """
+    await _download(
+        session,
+        url,
+        filepath,
+        max_bytes,
+        ARCHIVE_CONTENT_TYPES,
+        None,
+        "archive",
+        chunk_size,
+        timeout,
+    )
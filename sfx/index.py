@@ -0,0 +1,188 @@
+import bisect
+import os
+
+from redbot.core.utils.chat_formatting import pagify
+
+from .search import NameIndex
+
+
+def _with_prefix(names, prefix):
+    start = bisect.bisect_left(names, prefix)
+    end = start
+    while end < len(names) and names[end].startswith(prefix):
+        end += 1
+    return names[start:end]
+
+
+# Leaves room for the "Page n/m" footer under Discord's 2000 character limit.
+PAGE_LENGTH = 1900
+
+
+def render_listing(guild_names, global_names, overridden, alphabet_index):
+    """Renders sorted sound names into page strings for `listsfx`."""
+    lines = []
+    if guild_names:
+        lines.append("**Guild Sounds**:")
+        lines.extend(guild_names)
+    if global_names:
+        if lines:
+            lines.append("")
+        lines.append("**Global Sounds**:")
+        lines.extend(
+            f"{name} (overridden)" if name in overridden else name
+            for name in global_names
+        )
+    pages = list(pagify("\n".join(lines), delims=["\n"], page_length=PAGE_LENGTH))
+
+    if alphabet_index and len(pages) > 1:
+        # Point each initial letter at the first page it appears on. The index
+        # goes on pages of its own in front, so those pages stay under the limit.
+        first_pages = {}
+        for number, page in enumerate(pages, 1):
+            for line in page.splitlines():
+                if line and not line.startswith("**"):
+                    first_pages.setdefault(line[0].upper(), number)
+        offset = 1
+        while True:
+            index = " · ".join(
+                f"{letter}: {number + offset}" for letter, number in first_pages.items()
+            )
+            index_pages = list(
+                pagify(f"**Index**: {index}", delims=[" · "], page_length=PAGE_LENGTH)
+            )
+            if len(index_pages) == offset:
+                break
+            offset = len(index_pages)
+        pages = index_pages + pages
+
+    return [f"{page}\n\nPage {n}/{len(pages)}" for n, page in enumerate(pages, 1)]
+
+
+class SoundIndex:
+    """In-memory map of sound names to file paths, filled lazily from config."""
+
+    def __init__(self, config, sound_base, blobs):
+        self.config = config
+        self.sound_base = sound_base
+        self.blobs = blobs
+        self._global = None
+        self._global_names = None
+        self._guilds = {}
+        self._guild_names = {}
+        self._listings = {}
+
+    def _path(self, directory, value):
+        # Sounds point at blob digests; anything else is a file that couldn't
+        # be migrated into the blob store and is looked up where it used to be.
+        if self.blobs.is_digest(value):
+            return self.blobs.path_for(value)
+        return os.path.join(directory, value)
+
+    async def global_sounds(self):
+        if self._global is None:
+            sounds = await self.config.sounds()
+            self._global = {
+                name: self._path(self.sound_base, value)
+                for name, value in sounds.items()
+            }
+            self._global_names = NameIndex(self._global)
+        return self._global
+
+    async def guild_sounds(self, guild):
+        sounds = self._guilds.get(guild.id)
+        if sounds is None:
+            guild_dir = os.path.join(self.sound_base, str(guild.id))
+            config_sounds = await self.config.guild(guild).sounds()
+            sounds = self._guilds[guild.id] = {
+                name: self._path(guild_dir, value)
+                for name, value in config_sounds.items()
+            }
+            self._guild_names[guild.id] = NameIndex(sounds)
+        return sounds
+
+    async def resolve(self, guild, name):
+        """
+        Returns a (filepath, is_global) tuple for the sound, or None.
+        Guild sounds take priority over global ones.
+        """
+        guild_sounds = await self.guild_sounds(guild)
+        if name in guild_sounds:
+            return guild_sounds[name], False
+        global_sounds = await self.global_sounds()
+        if name in global_sounds:
+            return global_sounds[name], True
+        return None
+
+    async def listing(self, guild, prefix=None):
+        """
+        Returns the rendered `listsfx` pages for the guild, optionally only for
+        names starting with `prefix`. The unfiltered pages are cached.
+        """
+        cached = self._listings.get(guild.id)
+        if cached is None:
+            guild_sounds = await self.guild_sounds(guild)
+            global_sounds = await self.global_sounds()
+            guild_names = sorted(guild_sounds)
+            global_names = sorted(global_sounds)
+            cached = self._listings[guild.id] = (
+                guild_names,
+                global_names,
+                render_listing(guild_names, global_names, guild_sounds, True),
+            )
+        guild_names, global_names, pages = cached
+        if not prefix:
+            return pages
+        guild_sounds = await self.guild_sounds(guild)
+        return render_listing(
+            _with_prefix(guild_names, prefix),
+            _with_prefix(global_names, prefix),
+            guild_sounds,
+            False,
+        )
+
+    async def search(self, guild, prefix, limit=None):
+        """Returns the sorted names, guild or global, that start with `prefix`."""
+        await self.guild_sounds(guild)
+        await self.global_sounds()
+        matches = set(self._guild_names[guild.id].prefix(prefix, limit))
+        matches.update(self._global_names.prefix(prefix, limit))
+        return sorted(matches)[:limit]
+
+    async def suggest(self, guild, name, limit=3):
+        """Returns the names, guild or global, that look most like `name`."""
+        await self.guild_sounds(guild)
+        await self.global_sounds()
+        scored = {}
+        for index in (self._guild_names[guild.id], self._global_names):
+            for score, match in index.suggest(name, limit):
+                scored[match] = max(score, scored.get(match, 0))
+        return sorted(scored, key=lambda match: (-scored[match], match))[:limit]
+
+    def add_sound(self, guild_id, name, value):
+        """Adds a sound to the index. A guild_id of None means a global sound."""
+        if guild_id is None:
+            if self._global is not None:
+                self._global[name] = self._path(self.sound_base, value)
+                self._global_names.add(name)
+            self._listings.clear()
+        else:
+            sounds = self._guilds.get(guild_id)
+            if sounds is not None:
+                guild_dir = os.path.join(self.sound_base, str(guild_id))
+                sounds[name] = self._path(guild_dir, value)
+                self._guild_names[guild_id].add(name)
+            self._listings.pop(guild_id, None)
+
+    def remove_sound(self, guild_id, name):
+        """Removes a sound from the index. A guild_id of None means a global sound."""
+        if guild_id is None:
+            if self._global is not None:
+                self._global.pop(name, None)
+                self._global_names.remove(name)
+            self._listings.clear()
+        else:
+            sounds = self._guilds.get(guild_id)
+            if sounds is not None:
+                sounds.pop(name, None)
+                self._guild_names[guild_id].remove(name)
+            self._listings.pop(guild_id, None)
@@ -0,0 +1,100 @@
+import bisect
+import collections
+import contextlib
+import os
+import time
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf"))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket it falls in."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return BUCKETS[-1]
+
+
+class Metrics:
+    """Counters and per-stage latency histograms for the TTS/SFX pipeline."""
+
+    def __init__(self):
+        self.counters = collections.Counter()
+        self.histograms = collections.defaultdict(Histogram)
+
+    def inc(self, name, value=1):
+        self.counters[name] += value
+
+    def observe(self, stage, seconds):
+        self.histograms[stage].observe(seconds)
+
+    @contextlib.contextmanager
+    def time(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def summary(self):
+        """Returns a plain-text table of every stage and counter."""
+        lines = [f"{'stage':<14}{'count':>8}{'avg ms':>10}{'p50 ms':>10}{'p99 ms':>10}"]
+        for stage, histogram in sorted(self.histograms.items()):
+            average = histogram.sum / histogram.count if histogram.count else 0.0
+            lines.append(
+                f"{stage:<14}{histogram.count:>8}{average * 1000:>10.1f}"
+                f"{histogram.quantile(0.5) * 1000:>10.0f}"
+                f"{histogram.quantile(0.99) * 1000:>10.0f}"
+            )
+        lines.append("")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<24}{value:>14}")
+        return "\n".join(lines)
+
+    def render_prometheus(self, prefix="sfx"):
+        lines = []
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {value}")
+        if self.histograms:
+            metric = f"{prefix}_stage_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for stage, histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram.counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        f'{metric}_bucket{{stage="{stage}",le="{le}"}} {cumulative}'
+                    )
+                lines.append(f'{metric}_sum{{stage="{stage}"}} {histogram.sum}')
+                lines.append(f'{metric}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, filepath):
+        # Written to a sibling file and swapped in so scrapers never see half a dump.
+        partial_path = filepath + ".part"
+        with open(partial_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(partial_path, filepath)
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
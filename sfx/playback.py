@@ -0,0 +1,59 @@
+import asyncio
+
+
+class PlaybackState:
+    """Tracks the SFX playing in one guild and the track it interrupted."""
+
+    def __init__(self, release):
+        self.release = release
+        self.current_sfx = None
+        self.last_track_info = None
+        self.lock = asyncio.Lock()
+        self.finished = asyncio.Event()
+
+    @property
+    def idle(self):
+        return (
+            self.current_sfx is None
+            and self.last_track_info is None
+            and not self.lock.locked()
+        )
+
+    def start_sfx(self, track, pinned_path=None):
+        self.current_sfx = (track, pinned_path)
+        self.finished.clear()
+
+    def replace_sfx(self, track, pinned_path=None):
+        # The interrupted clip is done, but SFX playback isn't, so anyone
+        # waiting on `finished` keeps waiting for the new clip.
+        self._release_current()
+        self.current_sfx = (track, pinned_path)
+
+    def finish_sfx(self):
+        self._release_current()
+        self.current_sfx = None
+        self.finished.set()
+
+    def _release_current(self):
+        if self.current_sfx is not None and self.current_sfx[1] is not None:
+            self.release(self.current_sfx[1])
+
+
+class PlaybackStates(dict):
+    """
+    Per-guild PlaybackState map keyed by guild id.
+    `release` is called with the path of a pinned TTS cache clip once it's done playing.
+    """
+
+    def __init__(self, release):
+        super().__init__()
+        self.release = release
+
+    def __missing__(self, guild_id):
+        state = self[guild_id] = PlaybackState(self.release)
+        return state
+
+    def discard_if_idle(self, guild_id):
+        state = self.get(guild_id)
+        if state is not None and state.idle:
+            del self[guild_id]
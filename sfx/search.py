@@ -0,0 +1,65 @@
+import bisect
+import collections
+
+
+def _trigrams(name):
+    padded = f"  {name.lower()} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Sound names kept sorted for prefix lookups, plus a trigram index for
+    "did you mean" suggestions. Both are updated in place on add/remove.
+    """
+
+    def __init__(self, names=()):
+        self.names = sorted(names)
+        self.grams = collections.defaultdict(set)
+        for name in self.names:
+            for gram in _trigrams(name):
+                self.grams[gram].add(name)
+
+    def add(self, name):
+        index = bisect.bisect_left(self.names, name)
+        if index < len(self.names) and self.names[index] == name:
+            return
+        self.names.insert(index, name)
+        for gram in _trigrams(name):
+            self.grams[gram].add(name)
+
+    def remove(self, name):
+        index = bisect.bisect_left(self.names, name)
+        if index == len(self.names) or self.names[index] != name:
+            return
+        del self.names[index]
+        for gram in _trigrams(name):
+            names = self.grams.get(gram)
+            if names is not None:
+                names.discard(name)
+                if not names:
+                    del self.grams[gram]
+
+    def prefix(self, prefix, limit=None):
+        start = bisect.bisect_left(self.names, prefix)
+        matches = []
+        for name in self.names[start:]:
+            if not name.startswith(prefix) or len(matches) == limit:
+                break
+            matches.append(name)
+        return matches
+
+    def suggest(self, query, limit=3, cutoff=0.3):
+        """Returns (score, name) pairs for the names most similar to `query`."""
+        query_grams = _trigrams(query)
+        shared = collections.Counter()
+        for gram in query_grams:
+            shared.update(self.grams.get(gram, ()))
+        scored = []
+        for name, count in shared.items():
+            # Dice coefficient over trigram sets.
+            score = 2 * count / (len(query_grams) + len(_trigrams(name)))
+            if score >= cutoff:
+                scored.append((score, name))
+        scored.sort(key=lambda match: (-match[0], match[1]))
+        return scored[:limit]
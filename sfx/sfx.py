@@ -1,16 +1,38 @@
+import asyncio
 import datetime
 import os
-import random
-import tempfile
+import time
+import tarfile
+import zipfile
 
 import aiohttp
 import discord
 import lavalink
 import pydub
 from redbot.core import Config, checks, commands, data_manager
-from redbot.core.utils.chat_formatting import pagify
-
-from .api import TTSAPI
+from redbot.core.utils.chat_formatting import box, pagify
+from redbot.core.utils.menus import DEFAULT_CONTROLS, menu
+
+from .api import TTSAPI, LocalTTS
+from .audio import AudioWorker, concat_audio, ingest_sound, pad_audio
+from .blobs import BlobStore
+from .bulk import (
+    MAX_ARCHIVE_BYTES,
+    MAX_IMPORT_BYTES,
+    MAX_IMPORT_SOUNDS,
+    extract_sounds,
+    hash_file,
+    scan_sounds,
+)
+from .cache import TTSCache
+from .chunking import split_text
+from .download import DownloadError, download_archive, download_audio
+from .index import SoundIndex
+from .metrics import Metrics
+from .playback import PlaybackStates
+from .tempstore import TempAudioStore
+from .tracks import TrackCache
+from .ttsqueue import GuildTTSQueue, TTSJob
 
 
 class SFX(commands.Cog):
@@ -18,23 +40,100 @@ class SFX(commands.Cog):
 
     def __init__(self, bot):
         self.bot = bot
-        self.last_track_info = None
-        self.current_sfx = None
+        self.temp_audio = TempAudioStore(
+            (data_manager.cog_data_path(self) / "tmp").as_posix()
+        )
         self.config = Config.get_conf(self, identifier=134621854878007296)
         self.sound_base = (data_manager.cog_data_path(self) / "sounds").as_posix()
-        self.session = aiohttp.ClientSession()
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=20, ttl_dns_cache=300, keepalive_timeout=60
+            ),
+            timeout=aiohttp.ClientTimeout(total=20, connect=5),
+        )
+        self.tts_providers = {
+            provider.name: provider for provider in (TTSAPI(self.session), LocalTTS())
+        }
+        self.audio_worker = AudioWorker()
+        self.metrics = Metrics()
+        self.metrics_task = None
+        self.tts_cache = TTSCache(
+            (data_manager.cog_data_path(self) / "tts_cache").as_posix()
+        )
+        self.playback = PlaybackStates(self.tts_cache.unpin)
         user_config = {"voice": "clara", "speed": 0}
-        guild_config = {"sounds": {}, "channels": []}
-        global_config = {"sounds": {}}
+        guild_config = {
+            "sounds": {},
+            "sound_meta": {},
+            "channels": [],
+            "split_long_tts": False,
+            "tts_provider": TTSAPI.name,
+        }
+        global_config = {
+            "sounds": {},
+            "sound_meta": {},
+            "audio_workers": 2,
+            "max_sound_bytes": 5 * 1024 * 1024,
+            "metrics_export": False,
+        }
         self.config.register_user(**user_config)
         self.config.register_guild(**guild_config)
         self.config.register_global(**global_config)
+        self.blobs = BlobStore(os.path.join(self.sound_base, "blobs"))
+        self.sound_index = SoundIndex(self.config, self.sound_base, self.blobs)
+        self.track_cache = TrackCache()
+        self.tts_queues = {}
+        self.tts_channels = set()
         lavalink.register_event_listener(self.ll_check)
         if not os.path.exists(self.sound_base):
             os.makedirs(self.sound_base)
 
-    def __unload(self):
+    async def initialize(self):
+        self.temp_audio.start()
+        self.audio_worker.resize(await self.config.audio_workers())
+        for guild_data in (await self.config.all_guilds()).values():
+            self.tts_channels.update(guild_data["channels"])
+        await self._migrate_sounds()
+        if await self.config.metrics_export():
+            self.metrics_task = self.bot.loop.create_task(self._export_metrics())
+
+    async def _migrate_blobs(self, sounds, directory):
+        """
+        Moves any sound still stored by filename into the blob store and counts
+        references. Returns True if `sounds` was changed.
+        """
+        changed = False
+        for name, value in sounds.items():
+            if not self.blobs.is_digest(value):
+                filepath = os.path.join(directory, value)
+                if not os.path.exists(filepath):
+                    continue
+                value = sounds[name] = await self.audio_worker.run(
+                    self.blobs.put, filepath
+                )
+                changed = True
+            self.blobs.add_ref(value)
+        return changed
+
+    async def _migrate_sounds(self):
+        for guild_id, guild_data in (await self.config.all_guilds()).items():
+            sounds = guild_data["sounds"]
+            guild_dir = os.path.join(self.sound_base, str(guild_id))
+            if await self._migrate_blobs(sounds, guild_dir):
+                await self.config.guild_from_id(guild_id).sounds.set(sounds)
+        global_sounds = await self.config.sounds()
+        if await self._migrate_blobs(global_sounds, self.sound_base):
+            await self.config.sounds.set(global_sounds)
+
+    def cog_unload(self):
         lavalink.unregister_event_listener(self.ll_check)
+        self.bot.loop.create_task(self.session.close())
+        self.audio_worker.shutdown()
+        self.temp_audio.stop()
+        if self.metrics_task is not None:
+            self.metrics_task.cancel()
+        for queue in self.tts_queues.values():
+            queue.cancel()
 
     @commands.command()
     @commands.cooldown(
@@ -50,12 +149,9 @@ class SFX(commands.Cog):
             await ctx.send("You are not connected to a voice channel.")
             return
 
-        audio_file = os.path.join(
-            tempfile.gettempdir(),
-            "".join(random.choice("0123456789ABCDEF") for i in range(15)) + ".mp3",
-        )
+        provider = await self._tts_provider(ctx.guild)
         author_voice = await self.config.user(ctx.author).voice()
-        char_limit = TTSAPI.voices[author_voice]["limit"]
+        char_limit = provider.limit(author_voice)
         author_speed = await self.config.user(ctx.author).speed()
 
         encoded_string = text.encode("ascii", "ignore")
@@ -65,33 +161,37 @@ class SFX(commands.Cog):
             await ctx.send("That's not a valid message, sorry.")
             return
 
-        if len(decoded_string) > char_limit:
+        if (
+            len(decoded_string) > char_limit
+            and not await self.config.guild(ctx.guild).split_long_tts()
+        ):
             await ctx.send(
                 f"Sorry, this voice has a limit of **{str(char_limit)}** characters."
             )
             return
 
-        await TTSAPI.get_audio(
-            self, decoded_string, author_voice, author_speed, audio_file
-        )
-
+        self.metrics.inc("tts_requests")
+        start = time.perf_counter()
         try:
-            audio_data = pydub.AudioSegment.from_file(audio_file)
+            audio_file = await self._get_tts_audio(
+                provider, decoded_string, author_voice, author_speed, 750
+            )
         except Exception:
+            self.metrics.inc("tts_failures")
             await ctx.send(
                 "Uh oh, an error occured. The text you provided most likely isn't a valid message."
             )
             return
 
-        silence = pydub.AudioSegment.silent(duration=750)
-        padded_audio = silence + audio_data
-        padded_audio.export(audio_file)
         try:
-            await self._play_sfx(ctx.author.voice.channel, audio_file, True)
+            await self._play_sfx(ctx.author.voice.channel, audio_file, pinned=True)
         except Exception:
+            self.metrics.inc("playback_failures")
             await ctx.send(
                 "Oops, an error occured. It's likely that lavalink (the audio backend) isn't working properly."
             )
+            return
+        self.metrics.observe("tts_total", time.perf_counter() - start)
 
     @commands.command()
     @commands.cooldown(
@@ -108,66 +208,64 @@ class SFX(commands.Cog):
             await ctx.send("You are not connected to a voice channel.")
             return
 
-        if str(ctx.guild.id) not in os.listdir(self.sound_base):
-            os.makedirs(os.path.join(self.sound_base, str(ctx.guild.id)))
-
-        guild_sounds = await self.config.guild(ctx.guild).sounds()
-        global_sounds = await self.config.sounds()
-
-        if sound not in guild_sounds.keys():
-            if sound not in global_sounds.keys():
+        resolved = await self.sound_index.resolve(ctx.guild, sound)
+        if resolved is None:
+            suggestions = await self.sound_index.suggest(ctx.guild, sound)
+            if suggestions:
+                did_you_mean = ", ".join(f"**`{name}`**" for name in suggestions)
+                await ctx.send(
+                    f"Sound **`{sound}`** does not exist. Did you mean {did_you_mean}?"
+                )
+            else:
                 await ctx.send(
                     f"Sound **`{sound}`** does not exist. Try `{ctx.prefix}listsfx` for a list."
                 )
-                return
-
-        if sound in guild_sounds.keys():
-            filepath = os.path.join(
-                self.sound_base, str(ctx.guild.id), guild_sounds[sound]
-            )
-        else:
-            filepath = os.path.join(self.sound_base, global_sounds[sound])
+            return
 
+        filepath, is_global = resolved
         if not os.path.exists(filepath):
-            if sound in guild_sounds.keys():
-                del guild_sounds[sound]
-                await self.config.guild(ctx.guild).sounds.set(guild_sounds)
-                await ctx.send(
-                    "Looks like this sound's file has gone missing! I've removed it from the list of guild sounds."
-                )
-                if sound in global_sounds.keys():
-                    del global_sounds[sound]
-                    await self.config.sounds.set(global_sounds)
-                    await ctx.send(
-                        "Looks like this sound's file has gone missing! I've removed it from the list of global sounds."
-                    )
-                    return
-                else:
-                    return
-            if sound in global_sounds.keys():
-                del global_sounds[sound]
-                await self.config.sounds.set(global_sounds)
+            if is_global:
+                async with self.config.sounds() as global_sounds:
+                    self._release_sound(global_sounds.pop(sound, None))
+                await self.config.sound_meta.clear_raw(sound)
+                self.sound_index.remove_sound(None, sound)
                 await ctx.send(
                     "Looks like this sound's file has gone missing! I've removed it from the list of global sounds."
                 )
-                if sound in global_sounds.keys():
-                    del global_sounds[sound]
-                    await self.config.sounds.set(global_sounds)
-                    await ctx.send(
-                        "Looks like this sound's file has gone missing! I've removed it from the list of guild sounds."
-                    )
-                    return
-                else:
-                    return
             else:
-                await ctx.send("Sorry, I can't seem to find that SFX.")
+                async with self.config.guild(ctx.guild).sounds() as guild_sounds:
+                    self._release_sound(guild_sounds.pop(sound, None))
+                await self.config.guild(ctx.guild).sound_meta.clear_raw(sound)
+                self.sound_index.remove_sound(ctx.guild.id, sound)
+                await ctx.send(
+                    "Looks like this sound's file has gone missing! I've removed it from the list of guild sounds."
+                )
+            return
+
         try:
-            await self._play_sfx(ctx.author.voice.channel, filepath)
+            await self._play_sfx(ctx.author.voice.channel, filepath, cache_track=True)
         except Exception:
             await ctx.send(
                 "Oops, an error occured. It's likely that lavalink (the audio backend) isn't working properly."
             )
 
+    @commands.command()
+    @commands.guild_only()
+    async def sfxsearch(self, ctx, prefix: str):
+        """
+        Lists the sounds whose names start with the given text.
+        """
+        matches = await self.sound_index.search(ctx.guild, prefix, limit=51)
+        if not matches:
+            await ctx.send(f"No sounds start with **`{prefix}`**.")
+            return
+
+        more = ""
+        if len(matches) > 50:
+            matches = matches[:50]
+            more = f"\n...and more. Try `{ctx.prefix}listsfx {prefix}` for all of them."
+        await ctx.send(", ".join(f"`{name}`" for name in matches) + more)
+
     @commands.command()
     @commands.admin_or_permissions(manage_guild=True)
     @commands.guild_only()
@@ -178,9 +276,6 @@ class SFX(commands.Cog):
         """
         guild_sounds = await self.config.guild(ctx.guild).sounds()
 
-        if str(ctx.guild.id) not in os.listdir(self.sound_base):
-            os.makedirs(os.path.join(self.sound_base, str(ctx.guild.id)))
-
         attach = ctx.message.attachments
         if len(attach) > 1 or (attach and link):
             await ctx.send("Please only add one sound at a time.")
@@ -206,32 +301,21 @@ class SFX(commands.Cog):
             await ctx.send("Only .wav and .mp3 sounds are currently supported.")
             return
 
-        filepath = os.path.join(self.sound_base, str(ctx.guild.id), filename)
-
         if name in guild_sounds.keys():
             await ctx.send(
                 "A sound with that name already exists. Please choose another name and try again."
             )
             return
 
-        if os.path.exists(filepath):
-            await ctx.send(
-                "A sound with that filename already exists. Please change the filename and try again."
-            )
+        stored = await self._ingest_upload(ctx, url, file_extension, 750)
+        if stored is None:
             return
+        digest, meta = stored
 
-        async with self.session.get(url) as new_sound:
-            f = open(filepath, "wb")
-            f.write(await new_sound.read())
-            f.close()
-
-        audio_data = pydub.AudioSegment.from_file(filepath)
-        silence = pydub.AudioSegment.silent(duration=750)
-        padded_audio = silence + audio_data
-        padded_audio.export(filepath)
-
-        guild_sounds[name] = filename
+        guild_sounds[name] = digest
         await self.config.guild(ctx.guild).sounds.set(guild_sounds)
+        await self.config.guild(ctx.guild).sound_meta.set_raw(name, value=meta)
+        self.sound_index.add_sound(ctx.guild.id, name, digest)
 
         await ctx.send(f"Sound **{name}** added.")
 
@@ -271,38 +355,186 @@ class SFX(commands.Cog):
             await ctx.send("Only .wav and .mp3 sounds are currently supported.")
             return
 
-        filepath = os.path.join(self.sound_base, filename)
-
         if name in global_sounds.keys():
             await ctx.send(
                 "A sound with that name already exists. Please choose another name and try again."
             )
             return
 
-        if os.path.exists(filepath):
-            await ctx.send(
-                "A sound with that filename already exists. Please change the filename and try again."
-            )
-            return
-
-        async with self.session.get(url) as new_sound:
-            f = open(filepath, "wb")
-            f.write(await new_sound.read())
-            f.close()
-        try:
-            audio_data = pydub.AudioSegment.from_file(filepath)
-        except pydub.CouldntDecodeError:
-            await ctx.send("Uh oh, an error occured. Please try again later.")
+        stored = await self._ingest_upload(ctx, url, file_extension, 500)
+        if stored is None:
             return
-        silence = pydub.AudioSegment.silent(duration=500)
-        padded_audio = silence + audio_data
-        padded_audio.export(filepath)
+        digest, meta = stored
 
-        global_sounds[name] = filename
+        global_sounds[name] = digest
         await self.config.sounds.set(global_sounds)
+        await self.config.sound_meta.set_raw(name, value=meta)
+        self.sound_index.add_sound(None, name, digest)
 
         await ctx.send(f"Sound **{name}** added.")
 
+    @commands.command()
+    @commands.admin_or_permissions(manage_guild=True)
+    @commands.guild_only()
+    async def importsfx(self, ctx, directory: str = None):
+        """Adds every .wav and .mp3 sound in an archive.
+        Attach a .zip or .tar archive to your `[p]importsfx` message. Each sound is
+        named after its filename, and identical files are only added once.
+        The bot owner can instead give the path of a directory on the bot's machine.
+        """
+        attach = ctx.message.attachments
+        if directory is not None:
+            if not await self.bot.is_owner(ctx.author):
+                await ctx.send("Only the bot owner can import sounds from a directory.")
+                return
+            if not os.path.isdir(directory):
+                await ctx.send("That directory doesn't exist.")
+                return
+        elif len(attach) != 1:
+            await ctx.send("Please attach a single .zip or .tar archive.")
+            return
+
+        max_bytes = await self.config.max_sound_bytes()
+        extracted = []
+        try:
+            async with ctx.typing():
+                if directory is not None:
+                    sounds, complete = await self.audio_worker.run(
+                        scan_sounds, directory, max_bytes
+                    )
+                else:
+                    archive_path = self.temp_audio.new_path(suffix=".archive")
+                    try:
+                        await download_archive(
+                            self.session, attach[0].url, archive_path, MAX_ARCHIVE_BYTES
+                        )
+                        sounds, complete = await self.audio_worker.run(
+                            extract_sounds,
+                            archive_path,
+                            self.temp_audio.path,
+                            max_bytes,
+                        )
+                    except DownloadError as e:
+                        await ctx.send(str(e))
+                        return
+                    except (ValueError, tarfile.TarError, zipfile.BadZipFile):
+                        await ctx.send(
+                            "That doesn't look like a valid .zip or .tar archive."
+                        )
+                        return
+                    finally:
+                        self.temp_audio.release(archive_path)
+                    for _, filepath, _ in sounds:
+                        self.temp_audio.adopt(filepath)
+                        extracted.append(filepath)
+
+                guild_sounds = await self.config.guild(ctx.guild).sounds()
+                seen = set()
+                pending = {}
+                skipped = 0
+                for name, filepath, digest in sounds:
+                    if digest in seen or name in guild_sounds or name in pending:
+                        skipped += 1
+                        continue
+                    seen.add(digest)
+                    pending[name] = filepath
+
+                results = await asyncio.gather(
+                    *(
+                        self._ingest_to_blob(filepath, 750)
+                        for filepath in pending.values()
+                    ),
+                    return_exceptions=True,
+                )
+        finally:
+            for filepath in extracted:
+                self.temp_audio.release(filepath)
+
+        added = {}
+        meta = {}
+        failed = 0
+        for name, result in zip(pending, results):
+            if isinstance(result, Exception):
+                failed += 1
+                continue
+            added[name], meta[name] = result
+
+        if added:
+            guild_group = self.config.guild(ctx.guild)
+            try:
+                guild_data = await guild_group.all()
+                guild_data["sounds"].update(added)
+                guild_data["sound_meta"].update(meta)
+                await guild_group.set(guild_data)
+            except BaseException:
+                for digest in added.values():
+                    self.blobs.release(digest)
+                raise
+            for name, digest in added.items():
+                self.sound_index.add_sound(ctx.guild.id, name, digest)
+
+        message = (
+            f"Added **{len(added)}** sounds. "
+            f"Skipped **{skipped}** duplicates and **{failed}** files I couldn't decode."
+        )
+        if not complete:
+            message += (
+                f" I stopped after **{MAX_IMPORT_SOUNDS}** sounds or "
+                f"**{MAX_IMPORT_BYTES // 1024 // 1024} MiB**, so the rest weren't imported."
+            )
+        await ctx.send(message)
+
+    async def _ingest_to_blob(self, source, padding):
+        """
+        Ingests a sound into the blob store. Returns its (digest, metadata).
+        The caller owns one reference to the digest and must release it if the
+        sound doesn't end up in config.
+        """
+        output = self.temp_audio.new_path()
+        try:
+            meta = await self.audio_worker.run(ingest_sound, source, output, padding)
+            digest = await self.audio_worker.run(hash_file, output)
+            # Referenced before it's stored, so a delete running meanwhile can't
+            # remove an identical blob this sound is about to share.
+            self.blobs.add_ref(digest)
+            try:
+                await self.audio_worker.run(self.blobs.put, output, digest)
+            except BaseException:
+                self.blobs.release(digest)
+                raise
+        finally:
+            self.temp_audio.release(output)
+        return digest, meta
+
+    def _release_sound(self, value, directory=None):
+        """Drops a config entry's hold on its file, deleting it if unused."""
+        if value is None:
+            return
+        if self.blobs.is_digest(value):
+            self.blobs.release(value)
+        elif directory is not None:
+            filepath = os.path.join(directory, value)
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    async def _ingest_upload(self, ctx, url, extension, padding):
+        """
+        Downloads and ingests an uploaded sound into the blob store.
+        Returns its (digest, metadata), or None after telling the user what went wrong.
+        """
+        download_path = self.temp_audio.new_path(suffix=extension)
+        try:
+            await download_audio(
+                self.session, url, download_path, await self.config.max_sound_bytes()
+            )
+            return await self._ingest_to_blob(download_path, padding)
+        except DownloadError as e:
+            await ctx.send(str(e))
+        except pydub.exceptions.CouldntDecodeError:
+            await ctx.send("Uh oh, an error occured. Please try again later.")
+        finally:
+            self.temp_audio.release(download_path)
+
     @commands.command()
     @commands.admin_or_permissions(manage_guild=True)
     @commands.guild_only()
@@ -311,9 +543,6 @@ class SFX(commands.Cog):
         Deletes an existing sound.
         """
 
-        if str(ctx.guild.id) not in os.listdir(self.sound_base):
-            os.makedirs(os.path.join(self.sound_base, str(ctx.guild.id)))
-
         cfg_sounds = await self.config.guild(ctx.guild).sounds()
 
         if soundname not in cfg_sounds.keys():
@@ -322,15 +551,13 @@ class SFX(commands.Cog):
             )
             return
 
-        filepath = os.path.join(
-            self.sound_base, str(ctx.guild.id), cfg_sounds[soundname]
+        self._release_sound(
+            cfg_sounds.pop(soundname),
+            os.path.join(self.sound_base, str(ctx.guild.id)),
         )
-
-        if os.path.exists(filepath):
-            os.remove(filepath)
-
-        del cfg_sounds[soundname]
         await self.config.guild(ctx.guild).sounds.set(cfg_sounds)
+        await self.config.guild(ctx.guild).sound_meta.clear_raw(soundname)
+        self.sound_index.remove_sound(ctx.guild.id, soundname)
 
         await ctx.send(f"Sound **{soundname}** deleted.")
 
@@ -349,55 +576,37 @@ class SFX(commands.Cog):
             )
             return
 
-        filepath = os.path.join(self.sound_base, global_sounds[soundname])
-
-        if os.path.exists(filepath):
-            os.remove(filepath)
-
-        del global_sounds[soundname]
+        self._release_sound(global_sounds.pop(soundname), self.sound_base)
         await self.config.sounds.set(global_sounds)
+        await self.config.sound_meta.clear_raw(soundname)
+        self.sound_index.remove_sound(None, soundname)
 
         await ctx.send(f"Sound **{soundname}** deleted.")
 
     @commands.command()
     @commands.guild_only()
-    async def listsfx(self, ctx):
+    async def listsfx(self, ctx, prefix: str = None):
         """
         Lists all available sounds for this server.
+        If a prefix is provided, only sounds starting with it are listed.
         """
 
-        if str(ctx.guild.id) not in os.listdir(self.sound_base):
-            os.makedirs(os.path.join(self.sound_base, str(ctx.guild.id)))
-
-        guild_sounds = await self.config.guild(ctx.guild).sounds()
-        global_sounds = await self.config.sounds()
+        guild_sounds = await self.sound_index.guild_sounds(ctx.guild)
+        global_sounds = await self.sound_index.global_sounds()
 
         if (len(guild_sounds.items()) + len(global_sounds.items())) == 0:
             await ctx.send(f"No sounds found. Use `{ctx.prefix}addsfx` to add one.")
             return
 
-        txt = ""
-
-        if guild_sounds:
-            txt += "**Guild Sounds**:\n"
-            for sound in guild_sounds:
-                txt += sound + "\n"
-
-        if global_sounds:
-            txt += "\n**Global Sounds**:\n"
-            for sound in global_sounds:
-                if guild_sounds:
-                    if sound in guild_sounds:
-                        txt += sound + " (overridden)\n"
-                    else:
-                        txt += sound + "\n"
-                else:
-                    txt += sound + "\n"
-
-        pages = [p for p in pagify(text=txt, delims="\n")]
+        pages = await self.sound_index.listing(ctx.guild, prefix)
+        if not pages:
+            await ctx.send(f"No sounds start with **`{prefix}`**.")
+            return
 
-        for page in pages:
-            await ctx.send(page)
+        if len(pages) == 1:
+            await ctx.send(pages[0])
+        else:
+            await menu(ctx, pages, DEFAULT_CONTROLS)
 
     @commands.command(aliases=["setvoice"])
     async def myvoice(self, ctx, voice: str = None):
@@ -452,6 +661,10 @@ class SFX(commands.Cog):
         Lists all the TTS voices.
         """
         voices = TTSAPI.voices
+        if ctx.guild is not None:
+            provider = await self._tts_provider(ctx.guild)
+        else:
+            provider = self.tts_providers[TTSAPI.name]
         embed = discord.Embed(
             title="Available TTS Voices", color=await ctx.embed_colour()
         )
@@ -462,11 +675,167 @@ class SFX(commands.Cog):
                 + voices[voice]["language"]
                 + " - "
                 + "character limit: "
-                + str(voices[voice]["limit"])
+                + str(provider.limit(voice))
             )
             embed.add_field(name=voice, value=value, inline=False)
         await ctx.send(embed=embed)
 
+    @commands.group()
+    @commands.is_owner()
+    async def ttscache(self, ctx):
+        """
+        Manages the TTS audio cache.
+        """
+
+    @ttscache.command(name="stats")
+    async def ttscache_stats(self, ctx):
+        """
+        Shows TTS cache usage and hit/miss counters.
+        """
+        stats = self.tts_cache.stats()
+        embed = discord.Embed(title="TTS Cache", color=await ctx.embed_colour())
+        embed.add_field(name="Entries", value=str(stats["entries"]))
+        embed.add_field(name="Size", value=f"{stats['bytes'] / 1024 / 1024:.2f} MiB")
+        embed.add_field(name="Hits", value=str(stats["hits"]))
+        embed.add_field(name="Misses", value=str(stats["misses"]))
+        embed.add_field(name="Hit rate", value=f"{stats['hit_rate']:.1%}")
+        await ctx.send(embed=embed)
+
+    @ttscache.command(name="clear")
+    async def ttscache_clear(self, ctx):
+        """
+        Removes every cached TTS clip.
+        """
+        self.tts_cache.clear()
+        await ctx.send("Ok, I've cleared the TTS cache.")
+
+    @commands.command()
+    @commands.is_owner()
+    async def sfxworkers(self, ctx, workers: int = None):
+        """
+        Shows or sets the number of audio processing workers.
+        If no number is provided, it will show the current pool size and queue depth.
+        """
+        if workers is None:
+            await ctx.send(
+                f"**{self.audio_worker.workers}** audio workers, "
+                f"**{self.audio_worker.active}** busy, "
+                f"**{self.audio_worker.queued}** jobs queued."
+            )
+            return
+
+        if workers < 1 or workers > 16:
+            await ctx.send("The number of audio workers must be between 1 and 16.")
+            return
+
+        await self.config.audio_workers.set(workers)
+        self.audio_worker.resize(workers)
+        await ctx.send(f"Okay, I'll use **{workers}** audio workers from now on.")
+
+    @commands.command()
+    @commands.is_owner()
+    async def sfxmaxsize(self, ctx, kilobytes: int = None):
+        """
+        Shows or sets the maximum size of an uploaded sound, in KiB.
+        """
+        if kilobytes is None:
+            max_bytes = await self.config.max_sound_bytes()
+            await ctx.send(f"Sounds can be up to **{max_bytes // 1024} KiB**.")
+            return
+
+        if kilobytes < 1:
+            await ctx.send("The maximum size must be at least 1 KiB.")
+            return
+
+        await self.config.max_sound_bytes.set(kilobytes * 1024)
+        await ctx.send(f"Okay, sounds can now be up to **{kilobytes} KiB**.")
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.admin_or_permissions(manage_guild=True)
+    async def ttssplit(self, ctx, enabled: bool = None):
+        """
+        Toggles splitting TTS messages that are over the voice's character limit.
+        When enabled, long messages are spoken in chunks instead of being rejected.
+        """
+        if enabled is None:
+            enabled = not await self.config.guild(ctx.guild).split_long_tts()
+
+        await self.config.guild(ctx.guild).split_long_tts.set(enabled)
+        if enabled:
+            await ctx.send("Okay, long TTS messages will now be split up and spoken.")
+        else:
+            await ctx.send("Okay, long TTS messages will now be rejected.")
+
+    @commands.command()
+    @commands.guild_only()
+    @commands.admin_or_permissions(manage_guild=True)
+    async def ttsprovider(self, ctx, provider: str = None):
+        """
+        Shows or sets the TTS provider for this server.
+        `naver` uses the online Naver voices, `local` uses espeak on the bot's machine.
+        """
+        if provider is None:
+            current = await self._tts_provider(ctx.guild)
+            available = ", ".join(
+                f"`{name}`" for name, p in self.tts_providers.items() if p.available
+            )
+            await ctx.send(
+                f"This server uses the **{current.name}** TTS provider. Available: {available}"
+            )
+            return
+
+        provider = provider.lower()
+        if provider not in self.tts_providers:
+            await ctx.send("Sorry, that's not a valid TTS provider.")
+            return
+        if not self.tts_providers[provider].available:
+            await ctx.send("Sorry, that TTS provider isn't installed on this bot.")
+            return
+
+        await self.config.guild(ctx.guild).tts_provider.set(provider)
+        await ctx.send(f"Okay, this server now uses the **{provider}** TTS provider.")
+
+    @commands.group(invoke_without_command=True)
+    @commands.is_owner()
+    async def sfxmetrics(self, ctx):
+        """
+        Shows TTS and SFX pipeline latency and counters.
+        """
+        for page in pagify(self.metrics.summary(), delims=["\n"]):
+            await ctx.send(box(page))
+
+    @sfxmetrics.command(name="reset")
+    async def sfxmetrics_reset(self, ctx):
+        """
+        Resets every pipeline counter and histogram.
+        """
+        self.metrics.reset()
+        await ctx.send("Ok, I've reset the pipeline metrics.")
+
+    @sfxmetrics.command(name="export")
+    async def sfxmetrics_export(self, ctx, enabled: bool):
+        """
+        Toggles writing the metrics in Prometheus text format to a file every minute.
+        """
+        await self.config.metrics_export.set(enabled)
+        if self.metrics_task is not None:
+            self.metrics_task.cancel()
+            self.metrics_task = None
+        if enabled:
+            self.metrics_task = self.bot.loop.create_task(self._export_metrics())
+            await ctx.send(f"Okay, I'll write the metrics to `{self._metrics_path()}`.")
+        else:
+            await ctx.send("Okay, I've stopped writing the metrics file.")
+
+    def _metrics_path(self):
+        return (data_manager.cog_data_path(self) / "metrics.prom").as_posix()
+
+    async def _export_metrics(self):
+        while True:
+            self.metrics.write_prometheus(self._metrics_path())
+            await asyncio.sleep(60)
+
     @commands.group()
     @commands.guild_only()
     @commands.admin_or_permissions(manage_guild=True)
@@ -482,6 +851,7 @@ class SFX(commands.Cog):
         if channel.id not in channel_list:
             channel_list.append(channel.id)
             await self.config.guild(ctx.guild).channels.set(channel_list)
+            self.tts_channels.add(channel.id)
             await ctx.send(f"Okay, I've added {channel.mention} to the config.")
         else:
             await ctx.send(
@@ -497,6 +867,7 @@ class SFX(commands.Cog):
         if channel.id in channel_list:
             channel_list.remove(channel.id)
             await self.config.guild(ctx.guild).channels.set(channel_list)
+            self.tts_channels.discard(channel.id)
             await ctx.send(f"Okay, I've removed {channel.mention} from the config.")
         else:
             await ctx.send(
@@ -513,6 +884,7 @@ class SFX(commands.Cog):
             await ctx.send("There's no channels in the config.")
         else:
             await self.config.guild(ctx.guild).channels.set([])
+            self.tts_channels.difference_update(channel_list)
             await ctx.send("Ok, I've removed them all.")
 
     @ttschannel.command()
@@ -536,6 +908,8 @@ class SFX(commands.Cog):
 
     @commands.Cog.listener()
     async def on_message_without_command(self, message: discord.Message):
+        if message.channel.id not in self.tts_channels:
+            return
         if not message.guild:
             return
         if message.author.bot:
@@ -546,22 +920,14 @@ class SFX(commands.Cog):
             return
         if await self.bot.cog_disabled_in_guild(self, message.guild):
             return
-        channel_list = await self.config.guild(message.guild).channels()
-        if not channel_list:
-            return
-        if message.channel.id not in channel_list:
-            return
 
         if not message.author.voice or not message.author.voice.channel:
             await message.channel.send("You are not connected to a voice channel.")
             return
 
-        audio_file = os.path.join(
-            tempfile.gettempdir(),
-            "".join(random.choice("0123456789ABCDEF") for i in range(15)) + ".wav",
-        )
+        provider = await self._tts_provider(message.guild)
         author_voice = await self.config.user(message.author).voice()
-        char_limit = TTSAPI.voices[author_voice]["limit"]
+        char_limit = provider.limit(author_voice)
         author_speed = await self.config.user(message.author).speed()
 
         encoded_string = message.content.encode("ascii", "ignore")
@@ -571,104 +937,198 @@ class SFX(commands.Cog):
             await message.channel.send("That's not a valid message, sorry.")
             return
 
-        if len(decoded_string) > char_limit:
+        if (
+            len(decoded_string) > char_limit
+            and not await self.config.guild(message.guild).split_long_tts()
+        ):
             await message.channel.send(
                 f"Sorry, this voice has a limit of **{str(char_limit)}** characters."
             )
             return
 
-        await TTSAPI.get_audio(
-            self, decoded_string, author_voice, author_speed, audio_file
-        )
-        try:
-            audio_data = pydub.AudioSegment.from_file(audio_file)
-        except pydub.CouldntDecodeError:
-            await message.channel.send(
-                "Uh oh, an error occured. Please try again later."
+        queue = self.tts_queues.get(message.guild.id)
+        if queue is None:
+            queue = self.tts_queues[message.guild.id] = GuildTTSQueue(
+                self, message.guild.id
             )
-            return
-        silence = pydub.AudioSegment.silent(duration=500)
-        padded_audio = silence + audio_data
-        padded_audio.export(audio_file)
-        try:
-            await self._play_sfx(message.author.voice.channel, audio_file, True)
-        except Exception:
-            await message.channel.send(
-                "Oops, an error occured. It's likely that lavalink (the audio backend) isn't working properly."
-            )
-
-    async def _play_sfx(self, vc, filepath, is_tts=False):
-        player = await lavalink.connect(vc)
-        if player.fetch("connect") is None:
-            player.store("connect", datetime.datetime.utcnow())
-        tracks = await player.load_tracks(query=filepath)
-        track = tracks.tracks[0]
+        job = TTSJob(
+            provider,
+            decoded_string,
+            author_voice,
+            author_speed,
+            message.author.id,
+            message.author.voice.channel,
+            message.channel,
+        )
+        self.metrics.inc("tts_requests")
+        queue.submit(job, char_limit)
 
-        if player.current is None:
-            player.queue.append(track)
-            self.current_sfx = (track, is_tts)
-            await player.play()
-            return
+    async def _tts_provider(self, guild):
+        provider = self.tts_providers.get(await self.config.guild(guild).tts_provider())
+        if provider is None or not provider.available:
+            return self.tts_providers[TTSAPI.name]
+        return provider
 
-        if self.current_sfx is not None:
-            player.queue.insert(0, track)
-            await player.skip()
-            if self.current_sfx[1]:
-                os.remove(self.current_sfx[0].uri)
-            self.current_sfx = (track, is_tts)
-            return
+    async def _get_tts_audio(self, provider, text, voice, speed, padding):
+        """
+        Returns the path of a padded TTS clip, fetching and caching it on a miss.
+        The clip is pinned in the cache; unpin it, or hand it to _play_sfx with
+        pinned=True, once it's no longer needed.
+        """
+        key = TTSCache.key(provider.name, text, voice, speed, padding)
+        cached_path = self.tts_cache.get(key)
+        if cached_path is not None:
+            self.metrics.inc("tts_cache_hits")
+            self.tts_cache.pin(cached_path)
+            return cached_path
+        self.metrics.inc("tts_cache_misses")
+
+        audio_file = self.temp_audio.new_path()
+        try:
+            if len(text) > provider.limit(voice):
+                await self._synthesize_long_tts(
+                    provider, text, voice, speed, padding, audio_file
+                )
+            else:
+                await self._fetch_tts(provider, text, voice, speed, padding, audio_file)
+            cached_path = self.tts_cache.put(key, audio_file)
+            self.tts_cache.pin(cached_path)
+            return cached_path
+        finally:
+            self.temp_audio.release(audio_file)
+
+    async def _fetch_tts(self, provider, text, voice, speed, padding, audio_file):
+        with self.metrics.time("fetch"):
+            await provider.get_audio(text, voice, speed, audio_file)
+        if provider.remote:
+            self.metrics.inc("tts_bytes_fetched", os.path.getsize(audio_file))
+        if padding:
+            with self.metrics.time("pad"):
+                await self.audio_worker.run(pad_audio, audio_file, padding)
+
+    async def _synthesize_long_tts(
+        self, provider, text, voice, speed, padding, audio_file
+    ):
+        """
+        Synthesizes text over the voice's limit chunk by chunk, a few chunks at a
+        time, and joins the clips in order. Only the first chunk gets the lead-in.
+        The chunks bypass the TTS cache; only the joined clip is cached.
+        """
+        chunks = split_text(text, provider.limit(voice))
+        clips = [self.temp_audio.new_path() for _ in chunks]
+        semaphore = asyncio.Semaphore(4)
+
+        async def synthesize(index, chunk):
+            async with semaphore:
+                await self._fetch_tts(
+                    provider,
+                    chunk,
+                    voice,
+                    speed,
+                    padding if index == 0 else 0,
+                    clips[index],
+                )
 
-        self.last_track_info = (player.current, player.position)
-        self.current_sfx = (track, is_tts)
-        player.queue.insert(0, track)
-        player.queue.insert(1, player.current)
-        await player.skip()
+        try:
+            # Every fetch is waited out so none writes a chunk after it's released.
+            results = await asyncio.gather(
+                *(synthesize(index, chunk) for index, chunk in enumerate(chunks)),
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            with self.metrics.time("stitch"):
+                await self.audio_worker.run(concat_audio, clips, audio_file)
+        finally:
+            for clip in clips:
+                self.temp_audio.release(clip)
+
+    async def _warm_tracks(self, player, guild):
+        guild_sounds = await self.sound_index.guild_sounds(guild)
+        global_sounds = await self.sound_index.global_sounds()
+        filepaths = list(guild_sounds.values())
+        filepaths += [p for n, p in global_sounds.items() if n not in guild_sounds]
+        await self.track_cache.warm(player, filepaths[:100])
+
+    async def _play_sfx(self, vc, filepath, pinned=False, cache_track=False):
+        """
+        Plays a clip, interrupting whatever is playing. With pinned=True the
+        playback state takes over the caller's TTS cache pin on `filepath`.
+        """
+        try:
+            player = await lavalink.connect(vc)
+            if player.fetch("connect") is None:
+                player.store("connect", datetime.datetime.utcnow())
+                self.bot.loop.create_task(self._warm_tracks(player, vc.guild))
+            with self.metrics.time("load_tracks"):
+                if cache_track:
+                    track = await self.track_cache.load(player, filepath)
+                else:
+                    tracks = await player.load_tracks(query=filepath)
+                    track = tracks.tracks[0]
+        except BaseException:
+            # Nothing took over the pin yet, so a dead Lavalink mustn't leak it.
+            if pinned:
+                self.tts_cache.unpin(filepath)
+            raise
+        state = self.playback[vc.guild.id]
+
+        async with state.lock:
+            with self.metrics.time("lavalink_start"):
+                if player.current is None:
+                    player.queue.append(track)
+                    state.start_sfx(track, filepath if pinned else None)
+                    await player.play()
+                    return state
+
+                if state.current_sfx is not None:
+                    player.queue.insert(0, track)
+                    await player.skip()
+                    state.replace_sfx(track, filepath if pinned else None)
+                    return state
+
+                state.last_track_info = (player.current, player.position)
+                state.start_sfx(track, filepath if pinned else None)
+                player.queue.insert(0, track)
+                player.queue.insert(1, player.current)
+                await player.skip()
+                return state
 
     async def ll_check(self, player, event, reason):
-        if self.current_sfx is None and self.last_track_info is None:
+        guild_id = player.channel.guild.id
+        state = self.playback.get(guild_id)
+        if state is None:
             return
 
         if (
             event == lavalink.LavalinkEvents.TRACK_EXCEPTION
-            and self.current_sfx is not None
+            and state.current_sfx is not None
         ):
-            if self.current_sfx[1]:
-                os.remove(self.current_sfx[0].uri)
-            self.current_sfx = None
-            return
-
-        if (
+            state.finish_sfx()
+        elif (
             event == lavalink.LavalinkEvents.TRACK_STUCK
-            and self.current_sfx is not None
+            and state.current_sfx is not None
         ):
-            if self.current_sfx[1]:
-                os.remove(self.current_sfx[0].uri)
-            self.current_sfx = None
+            state.finish_sfx()
             await player.skip()
-            return
-
-        if (
+        elif (
             event == lavalink.LavalinkEvents.TRACK_END
             and player.current is None
-            and self.current_sfx is not None
+            and state.current_sfx is not None
         ):
-            if self.current_sfx[1]:
-                os.remove(self.current_sfx[0].uri)
-            self.current_sfx = None
-            return
-
-        if (
+            state.finish_sfx()
+        elif (
             event == lavalink.LavalinkEvents.TRACK_END
-            and self.last_track_info is not None
+            and state.last_track_info is not None
             and player.current
             and player.current.track_identifier
-            == self.last_track_info[0].track_identifier
+            == state.last_track_info[0].track_identifier
         ):
-            print(str(self.last_track_info[0].uri))
-            if self.current_sfx[1]:
-                os.remove(self.current_sfx[0].uri)
-            self.current_sfx = None
+            state.finish_sfx()
             await player.pause()
-            await player.seek(self.last_track_info[1])
+            await player.seek(state.last_track_info[1])
             await player.pause(False)
-            self.last_track_info = None
+            state.last_track_info = None
+
+        self.playback.discard_if_idle(guild_id)
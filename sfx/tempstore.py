@@ -0,0 +1,74 @@
+import asyncio
+import os
+import secrets
+import time
+
+
+class TempAudioStore:
+    """
+    Hands out temporary audio paths under the cog's data directory.
+
+    A path's file is removed when it's released. Anything left behind by a
+    crash or a cog reload is swept up by the janitor once it's older than
+    `max_age` seconds.
+    """
+
+    def __init__(self, path, max_age=3600, interval=600):
+        self.path = path
+        self.max_age = max_age
+        self.interval = interval
+        self.tracked = set()
+        self.task = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def new_path(self, suffix=".mp3"):
+        filepath = os.path.join(self.path, secrets.token_hex(8) + suffix)
+        self.tracked.add(filepath)
+        return filepath
+
+    def adopt(self, filepath):
+        """Starts tracking a file that was written into the store's directory."""
+        self.tracked.add(filepath)
+
+    def release(self, filepath):
+        if filepath not in self.tracked:
+            return
+        self.tracked.discard(filepath)
+        self._remove(filepath)
+
+    def _remove(self, filepath):
+        # pad_audio writes a sibling file before swapping it in.
+        for path in (filepath, filepath + ".pad"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sweep(self, max_age=None):
+        """Removes files older than max_age, tracked or not. Returns how many."""
+        max_age = self.max_age if max_age is None else max_age
+        cutoff = time.time() - max_age
+        removed = 0
+        for filename in os.listdir(self.path):
+            filepath = os.path.join(self.path, filename)
+            try:
+                if os.path.getmtime(filepath) > cutoff:
+                    continue
+                os.remove(filepath)
+            except FileNotFoundError:
+                continue
+            self.tracked.discard(filepath)
+            removed += 1
+        return removed
+
+    async def _janitor(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sweep()
+
+    def start(self):
+        # Nothing can be in use yet, so orphans from a previous run go right away.
+        self.sweep(max_age=0)
+        self.task = asyncio.get_running_loop().create_task(self._janitor())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
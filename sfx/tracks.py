@@ -0,0 +1,37 @@
+import asyncio
+import collections
+import os
+
+
+class TrackCache:
+    """LRU cache of resolved Lavalink tracks, keyed by (node, filepath, mtime)."""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+
+    async def load(self, player, filepath):
+        key = (player.node, filepath, os.stat(filepath).st_mtime_ns)
+        track = self.entries.get(key)
+        if track is not None:
+            self.entries.move_to_end(key)
+            return track
+
+        tracks = await player.load_tracks(query=filepath)
+        track = tracks.tracks[0]
+        self.entries[key] = track
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return track
+
+    async def warm(self, player, filepaths, concurrency=4):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def load(filepath):
+            async with semaphore:
+                try:
+                    await self.load(player, filepath)
+                except Exception:
+                    pass
+
+        await asyncio.gather(*(load(filepath) for filepath in filepaths))
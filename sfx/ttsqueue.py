@@ -0,0 +1,136 @@
+import asyncio
+import collections
+import functools
+import time
+
+
+def _release_result(release, audio):
+    if not audio.cancelled() and audio.exception() is None:
+        release(audio.result())
+
+
+class TTSJob:
+    def __init__(
+        self, provider, text, voice, speed, author_id, voice_channel, text_channel
+    ):
+        self.provider = provider
+        self.text = text
+        self.voice = voice
+        self.speed = speed
+        self.author_id = author_id
+        self.voice_channel = voice_channel
+        self.text_channel = text_channel
+        self.created = time.monotonic()
+        self.audio = None
+
+    def can_merge(self, other, limit):
+        return (
+            self.provider is other.provider
+            and self.author_id == other.author_id
+            and self.voice == other.voice
+            and self.speed == other.speed
+            and self.voice_channel == other.voice_channel
+            and len(self.text) + 1 + len(other.text) <= limit
+        )
+
+    def discard(self, release):
+        # Synthesis that's already running is left to finish so the clip still
+        # lands in the TTS cache; only the result is ignored, and its pin released.
+        if self.audio is not None:
+            self.audio.add_done_callback(functools.partial(_release_result, release))
+            self.audio = None
+
+
+class GuildTTSQueue:
+    """
+    Plays a guild's auto-TTS messages one after another.
+
+    At most `max_size` messages wait at once; the oldest are dropped under
+    backlog, and consecutive short messages from the same author are merged.
+    The next message's audio is synthesized while the current one plays.
+    """
+
+    def __init__(self, cog, guild_id, max_size=5, max_age=30, play_timeout=300):
+        self.cog = cog
+        self.guild_id = guild_id
+        self.max_size = max_size
+        self.max_age = max_age
+        self.play_timeout = play_timeout
+        self.jobs = collections.deque()
+        self.task = None
+        self.dropped = 0
+
+    def submit(self, job, limit):
+        if self.jobs and self.jobs[-1].can_merge(job, limit):
+            previous = self.jobs.pop()
+            previous.discard(self.cog.tts_cache.unpin)
+            job.text = f"{previous.text} {job.text}"
+            job.created = previous.created
+        while len(self.jobs) >= self.max_size:
+            self.jobs.popleft().discard(self.cog.tts_cache.unpin)
+            self.dropped += 1
+            self.cog.metrics.inc("tts_dropped")
+        self.jobs.append(job)
+        if self.task is None or self.task.done():
+            self.task = asyncio.get_running_loop().create_task(self._run())
+        else:
+            self._prefetch(self.jobs[0])
+
+    def _prefetch(self, job):
+        if job.audio is None:
+            job.audio = asyncio.ensure_future(
+                self.cog._get_tts_audio(
+                    job.provider, job.text, job.voice, job.speed, 500
+                )
+            )
+
+    async def _run(self):
+        try:
+            while self.jobs:
+                job = self.jobs.popleft()
+                if time.monotonic() - job.created > self.max_age:
+                    job.discard(self.cog.tts_cache.unpin)
+                    self.dropped += 1
+                    self.cog.metrics.inc("tts_dropped")
+                    continue
+                self._prefetch(job)
+                if self.jobs:
+                    self._prefetch(self.jobs[0])
+                await self._play(job)
+        finally:
+            for job in self.jobs:
+                job.discard(self.cog.tts_cache.unpin)
+            self.jobs.clear()
+            if self.cog.tts_queues.get(self.guild_id) is self:
+                del self.cog.tts_queues[self.guild_id]
+
+    async def _play(self, job):
+        try:
+            audio_file = await job.audio
+        except Exception:
+            self.cog.metrics.inc("tts_failures")
+            await job.text_channel.send(
+                "Uh oh, an error occured. Please try again later."
+            )
+            return
+
+        try:
+            state = await self.cog._play_sfx(job.voice_channel, audio_file, pinned=True)
+        except Exception:
+            self.cog.metrics.inc("playback_failures")
+            await job.text_channel.send(
+                "Oops, an error occured. It's likely that lavalink (the audio backend) isn't working properly."
+            )
+            return
+        self.cog.metrics.observe("auto_tts_total", time.monotonic() - job.created)
+
+        # `finished` is only set once the guild has no SFX playing, so a manual
+        # sfx/tts that interrupts this clip is heard out before the next message.
+        try:
+            await asyncio.wait_for(state.finished.wait(), timeout=self.play_timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
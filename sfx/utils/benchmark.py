@@ -0,0 +1,387 @@
+"""
+Load benchmark for the SFX cog's playback pipeline.
+
+Drives `tts`, `sfx` and the auto-TTS listener for a number of guilds at once,
+against a local HTTP stand-in for the Naver endpoint and a fake Lavalink player
+that records every queue/skip/seek call. Needs Red, Red-Lavalink and the cog's
+requirements installed; no bot token or Lavalink server is used.
+
+Run from the repository root:
+
+    python -m sfx.utils.benchmark --guilds 20 --clips 25
+"""
+
+import argparse
+import asyncio
+import collections
+import copy
+import resource
+import tempfile
+import time
+import types
+
+import lavalink
+from aiohttp import web
+from redbot.core import data_manager
+
+from ..api import TTSAPI
+from ..audio import _silent_mp3_frames
+from ..metrics import Metrics
+from ..sfx import SFX
+
+# One second of silent 128 kbps / 48 kHz mono MP3, served for every TTS request.
+CLIP_HEADER = bytes((0xFF, 0xFB, 0x94, 0xC0))
+CLIP = _silent_mp3_frames(CLIP_HEADER, 384, 42)
+
+
+class RecordingMetrics(Metrics):
+    """Keeps every raw sample so exact percentiles can be reported."""
+
+    def __init__(self):
+        super().__init__()
+        self.samples = collections.defaultdict(list)
+
+    def observe(self, stage, seconds):
+        super().observe(stage, seconds)
+        self.samples[stage].append(seconds)
+
+    def reset(self):
+        super().reset()
+        self.samples.clear()
+
+
+class FakeTrack:
+    def __init__(self, uri):
+        self.uri = uri
+        self.track_identifier = uri
+
+
+class FakePlayer:
+    """
+    Enough of lavalink.Player for the cog: tracks start when played or skipped
+    to and end after `clip_seconds`, firing the same events Lavalink would.
+    """
+
+    def __init__(self, bench, channel):
+        self.bench = bench
+        self.channel = channel
+        self.node = "fake"
+        self.queue = []
+        self.current = None
+        self.position = 0
+        self.calls = collections.Counter()
+        self._stored = {}
+        self._ending = None
+
+    def store(self, key, value):
+        self._stored[key] = value
+
+    def fetch(self, key, default=None):
+        return self._stored.get(key, default)
+
+    async def load_tracks(self, query):
+        self.calls["load_tracks"] += 1
+        await asyncio.sleep(self.bench.load_delay)
+        return types.SimpleNamespace(tracks=[FakeTrack(query)])
+
+    async def play(self):
+        self.calls["play"] += 1
+        self._next()
+
+    async def skip(self):
+        self.calls["skip"] += 1
+        replaced = self.current
+        self._next()
+        if replaced is not None:
+            self._dispatch(lavalink.TrackEndReason.REPLACED)
+
+    async def pause(self, pause=True):
+        self.calls["pause"] += 1
+
+    async def seek(self, position):
+        self.calls["seek"] += 1
+        self.position = position
+
+    def _next(self):
+        if self._ending is not None:
+            self._ending.cancel()
+            self._ending = None
+        self.current = self.queue.pop(0) if self.queue else None
+        self.position = 0
+        if self.current is not None and self.current.uri != "music":
+            self._ending = asyncio.ensure_future(self._end())
+
+    async def _end(self):
+        await asyncio.sleep(self.bench.clip_seconds)
+        self._ending = None
+        self._next()
+        self._dispatch(lavalink.TrackEndReason.FINISHED)
+
+    def _dispatch(self, reason):
+        asyncio.ensure_future(
+            self.bench.cog.ll_check(self, lavalink.LavalinkEvents.TRACK_END, reason)
+        )
+
+
+class Benchmark:
+    def __init__(self, args):
+        self.args = args
+        self.load_delay = args.load_ms / 1000
+        self.clip_seconds = args.clip_ms / 1000
+        self.cog = None
+        self.players = {}
+        self.replies = collections.Counter()
+        self.peak_rss = 0.0
+
+    async def connect(self, channel):
+        player = self.players.get(channel.guild.id)
+        if player is None:
+            player = self.players[channel.guild.id] = FakePlayer(self, channel)
+            if self.args.music:
+                # Background music that every clip interrupts and resumes.
+                player.current = FakeTrack("music")
+        return player
+
+    async def tts_endpoint(self, request):
+        await asyncio.sleep(self.args.latency_ms / 1000)
+        return web.Response(body=CLIP, content_type="audio/mpeg")
+
+    def text(self, guild_id, number):
+        if self.args.repeat and number % self.args.repeat:
+            number = 0
+        return f"benchmark message {number} for guild {guild_id}"
+
+    def guild(self, guild_id):
+        guild = types.SimpleNamespace(id=guild_id, me=object())
+        user = types.SimpleNamespace(id=guild_id, bot=False)
+        user.voice = types.SimpleNamespace(
+            channel=types.SimpleNamespace(id=guild_id, guild=guild)
+        )
+        return guild, user
+
+    def channel(self, channel_id):
+        async def send(*args, **kwargs):
+            self.replies[args[0] if args else "embed"] += 1
+
+        return types.SimpleNamespace(
+            id=channel_id,
+            send=send,
+            permissions_for=lambda member: types.SimpleNamespace(send_messages=True),
+        )
+
+    def context(self, guild_id):
+        guild, user = self.guild(guild_id)
+        channel = self.channel(guild_id)
+        return types.SimpleNamespace(
+            guild=guild,
+            author=user,
+            channel=channel,
+            send=channel.send,
+            prefix="!",
+            message=types.SimpleNamespace(attachments=[]),
+        )
+
+    async def run_tts(self, guild_id):
+        ctx = self.context(guild_id)
+        for number in range(self.args.clips):
+            await self.cog.tts.callback(self.cog, ctx, text=self.text(guild_id, number))
+
+    async def run_sfx(self, guild_id):
+        ctx = self.context(guild_id)
+        for _ in range(self.args.clips):
+            started = self.playback_starts(guild_id)
+            start = time.perf_counter()
+            await self.cog.sfx.callback(self.cog, ctx, "bench")
+            # Misses and Lavalink failures end in a reply, not in playback.
+            if self.playback_starts(guild_id) > started:
+                self.cog.metrics.observe("sfx_total", time.perf_counter() - start)
+
+    def playback_starts(self, guild_id):
+        player = self.players.get(guild_id)
+        if player is None:
+            return 0
+        return player.calls["play"] + player.calls["skip"]
+
+    async def run_auto(self, guild_id):
+        guild, user = self.guild(guild_id)
+        channel = self.channel(guild_id)
+        self.cog.tts_channels.add(guild_id)
+        for number in range(self.args.clips):
+            message = types.SimpleNamespace(
+                guild=guild,
+                author=user,
+                channel=channel,
+                content=self.text(guild_id, number),
+            )
+            await self.cog.on_message_without_command(message)
+            await asyncio.sleep(self.args.interval_ms / 1000)
+
+    async def setup(self, data_path, port):
+        # A throwaway JSON-backed data directory, like Red's own test fixtures.
+        data_manager.basic_config = copy.deepcopy(data_manager.basic_config_default)
+        data_manager.basic_config["DATA_PATH"] = data_path
+        data_manager.basic_config["STORAGE_TYPE"] = "JSON"
+        lavalink.connect = self.connect
+        TTSAPI.endpoint = (
+            f"http://127.0.0.1:{port}/nvoice?text={{}}&speaker={{}}&speed={{}}"
+        )
+
+        async def no(*args, **kwargs):
+            return False
+
+        async def yes(*args, **kwargs):
+            return True
+
+        bot = types.SimpleNamespace(
+            loop=asyncio.get_running_loop(),
+            allowed_by_whitelist_blacklist=yes,
+            cog_disabled_in_guild=no,
+            is_owner=no,
+        )
+        self.cog = SFX(bot)
+        self.cog.metrics = RecordingMetrics()
+        await self.cog.initialize()
+        await self.cog.config.audio_workers.set(self.args.workers)
+        self.cog.audio_worker.resize(self.args.workers)
+
+        sound_path = self.cog.temp_audio.new_path()
+        with open(sound_path, "wb") as f:
+            f.write(CLIP)
+        digest = await self.cog.audio_worker.run(self.cog.blobs.put, sound_path)
+        self.cog.temp_audio.release(sound_path)
+        self.cog.blobs.add_ref(digest)
+        await self.cog.config.sounds.set({"bench": digest})
+        self.cog.sound_index.add_sound(None, "bench", digest)
+
+    async def measure(self, mode):
+        runner = getattr(self, f"run_{mode}")
+        self.cog.metrics.reset()
+        self.replies.clear()
+        self.players.clear()
+        start_rss = rss_mib()
+        sampling_done = asyncio.Event()
+        sampler = asyncio.ensure_future(sample_rss(sampling_done))
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(runner(guild_id) for guild_id in range(1, self.args.guilds + 1))
+        )
+        while self.cog.tts_queues:
+            await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        sampling_done.set()
+        mode_peak_rss = await sampler
+        self.peak_rss = max(self.peak_rss, mode_peak_rss)
+        # Let the last clips finish so the next mode starts from idle players.
+        while any(player._ending for player in self.players.values()):
+            await asyncio.sleep(0.01)
+
+        calls = sum(
+            (player.calls for player in self.players.values()), collections.Counter()
+        )
+        stage = {"tts": "tts_total", "sfx": "sfx_total", "auto": "auto_tts_total"}
+        samples = sorted(self.cog.metrics.samples[stage[mode]])
+        print(f"== {mode}: {self.args.guilds} guilds x {self.args.clips} clips")
+        print(
+            f"  clips played {len(samples)} in {elapsed:.2f}s "
+            f"({len(samples) / elapsed:.1f} clips/s)"
+        )
+        print(
+            f"  latency p50 {percentile(samples, 0.5) * 1000:.1f} ms, "
+            f"p99 {percentile(samples, 0.99) * 1000:.1f} ms"
+        )
+        print(
+            f"  RSS {start_rss:.1f} MiB at start, {mode_peak_rss:.1f} MiB peak "
+            f"during this mode (highest across modes so far {self.peak_rss:.1f} MiB)"
+        )
+        print(f"  lavalink calls {dict(sorted(calls.items()))}")
+        if self.replies:
+            print(f"  replies sent {sum(self.replies.values())}:")
+            for reply, count in self.replies.most_common():
+                print(f"    {count:>5}  {reply[:70]}")
+        print(self.cog.metrics.summary())
+        print()
+
+    async def run(self):
+        app = web.Application()
+        app.router.add_get("/nvoice", self.tts_endpoint)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        try:
+            with tempfile.TemporaryDirectory() as data_path:
+                await self.setup(data_path, port)
+                try:
+                    for mode in self.args.modes:
+                        await self.measure(mode)
+                finally:
+                    self.cog.cog_unload()
+                    await asyncio.sleep(0.1)
+        finally:
+            await runner.cleanup()
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def rss_mib():
+    # The second field of statm is the resident set, in pages.
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 2**20
+
+
+async def sample_rss(done, interval=0.02):
+    """Samples the RSS until `done` is set, then returns the highest sample."""
+    peak = rss_mib()
+    while not done.is_set():
+        try:
+            await asyncio.wait_for(done.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+        peak = max(peak, rss_mib())
+    return peak
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=10, help="concurrent guilds")
+    parser.add_argument("--clips", type=int, default=20, help="clips per guild")
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=("tts", "sfx", "auto"),
+        default=["tts", "sfx", "auto"],
+    )
+    parser.add_argument(
+        "--latency-ms", type=float, default=50, help="TTS endpoint response time"
+    )
+    parser.add_argument(
+        "--load-ms", type=float, default=5, help="Lavalink load_tracks time"
+    )
+    parser.add_argument(
+        "--clip-ms", type=float, default=200, help="how long each clip plays"
+    )
+    parser.add_argument(
+        "--interval-ms", type=float, default=50, help="gap between auto-TTS messages"
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=0,
+        help="reuse the first message except every Nth one, to exercise the TTS cache",
+    )
+    parser.add_argument("--workers", type=int, default=2, help="audio workers")
+    parser.add_argument(
+        "--music", action="store_true", help="interrupt background music with each clip"
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(Benchmark(parse_args()).run())